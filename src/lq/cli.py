@@ -30,6 +30,22 @@ from lq.templates import (
 )
 
 
+def _run(main) -> None:
+    """运行顶层协程。
+
+    装了 uvloop（可选依赖 ``lq[speed]``）时使用它的事件循环：子进程管道和
+    socket 读写由 libuv 实现，频繁的 Bash / CC 子进程调用开销更小。只作用于
+    这一个循环，不改全局 event loop policy（飞书 SDK 线程里的循环不受影响）。
+    """
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main)
+        return
+    with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+        runner.run(main)
+
+
 def _resolve(instance: str) -> tuple[Path, str, LQConfig | None]:
     """解析实例标识 → (home, display_name, config_or_None)
 
@@ -207,7 +223,7 @@ def start(instance: str, adapter_str: str, show_thinking: bool) -> None:
 
     from lq.gateway import AssistantGateway
     gw = AssistantGateway(config, home, adapter_types=adapter_types)
-    asyncio.run(gw.run())
+    _run(gw.run())
     # 强制退出：避免第三方库残留线程/连接池导致进程挂起
     raise SystemExit(0)
 
@@ -270,7 +286,7 @@ def restart(instance: str, adapter_str: str) -> None:
     click.echo(f"启动 @{display} (adapter={'+'.join(adapter_types)}) ...")
     from lq.gateway import AssistantGateway
     gw = AssistantGateway(config, home, adapter_types=adapter_types)
-    asyncio.run(gw.run())
+    _run(gw.run())
     # 强制退出：避免第三方库残留线程/连接池导致进程挂起
     raise SystemExit(0)
 
@@ -410,7 +426,7 @@ def _run_local_chat(instance: str, message: str) -> None:
     config = cfg or load_config(home)
 
     from lq.conversation import run_conversation
-    asyncio.run(run_conversation(home, config, single_message=message))
+    _run(run_conversation(home, config, single_message=message))
 
 
 @cli.command()
@@ -5,6 +5,7 @@ from __future__ import annotations
 import asyncio
 import base64
 import logging
+import os
 import threading
 from dataclasses import replace
 from typing import Any
@@ -58,7 +59,6 @@ def _is_text_attachment(content_type: str, filename: str) -> bool:
     if ct in _TEXT_MIME_TYPES:
         return True
     if filename:
-        import os
         _, ext = os.path.splitext(filename.lower())
         if ext in _TEXT_EXTENSIONS:
             return True
@@ -101,6 +101,8 @@ class DiscordAdapter(PlatformAdapter):
         # discord.Client 实例（在 connect 中创建）
         self._client: discord.Client | None = None
         self._client_ready = threading.Event()
+        # bot 自身 user id（on_ready 时写入），on_message 用整数比较过滤自己的消息
+        self._bot_user_id: int | None = None
 
         # 缓存：user_id → display_name
         self._name_cache: dict[str, str] = {}
@@ -142,7 +144,6 @@ class DiscordAdapter(PlatformAdapter):
         # discord.py 内部用 aiohttp，不读环境变量代理，需要显式传入
         proxy = self._proxy
         if not proxy:
-            import os
             proxy = os.environ.get("HTTPS_PROXY") or os.environ.get("HTTP_PROXY") or ""
         client = discord.Client(intents=intents, proxy=proxy or None)
         self._client = client
@@ -153,6 +154,7 @@ class DiscordAdapter(PlatformAdapter):
         @client.event
         async def on_ready() -> None:
             logger.info("Discord client ready: %s (%s)", client.user, client.user.id)
+            self._bot_user_id = client.user.id
             client_ready.set()
 
         @client.event
@@ -161,7 +163,7 @@ class DiscordAdapter(PlatformAdapter):
             if not client_ready.is_set():
                 return
             # 忽略自己的消息
-            if message.author == client.user:
+            if message.author.id == self._bot_user_id:
                 return
             # 跨线程投递到主事件循环的 _raw_queue
             main_loop.call_soon_threadsafe(
@@ -249,6 +251,11 @@ class DiscordAdapter(PlatformAdapter):
                     logger.warning("Discord client loop 未运行，无法优雅关闭")
             except Exception:
                 logger.warning("关闭 Discord client 失败", exc_info=True)
+        # 关闭 REST 连接池
+        try:
+            await self._sender.aclose()
+        except Exception:
+            logger.debug("关闭 Discord REST client 失败", exc_info=True)
 
     # ── 表达 ──
 
@@ -3,21 +3,137 @@
 from __future__ import annotations
 
 import asyncio
+import json as _json
 import logging
-from typing import Any
+import mimetypes
+import os
+import random
+import re
+import secrets
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, AsyncIterator
 from urllib.parse import quote as url_quote
 
 import httpx
 
+try:  # 可选加速（speed extra）：orjson 序列化请求体
+    import orjson as _orjson
+except ImportError:
+    _orjson = None
+
 logger = logging.getLogger(__name__)
 
 BASE_URL = "https://discord.com/api/v10"
 
+# 重试退避参数：delay = min(cap, base * 2**attempt) + uniform(0, jitter)
+_NET_BACKOFF_BASE = 0.5
+_NET_BACKOFF_CAP = 30.0
+_NET_BACKOFF_JITTER = 0.25
+_RATE_LIMIT_BACKOFF_BASE = 0.25
+_RATE_LIMIT_BACKOFF_CAP = 10.0
+_RATE_LIMIT_BACKOFF_JITTER = 0.1
+
+
+def _dumps(obj: Any) -> bytes:
+    """序列化 JSON 请求体为 bytes（优先 orjson）。"""
+    if _orjson is not None:
+        return _orjson.dumps(obj)
+    return _json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+# 路由模板：保留 major parameter（channel/guild/webhook id），其余 ID 与 emoji 归一化
+_MINOR_ID_RE = re.compile(r"(?<!/channels)(?<!/guilds)(?<!/webhooks)/\d{5,}")
+_REACTION_EMOJI_RE = re.compile(r"/reactions/[^/]+")
+_MAJOR_PARAM_RE = re.compile(r"/(?:channels|guilds|webhooks)/(\d+)")
+
+
+def _route_key(method: str, path: str) -> str:
+    """将请求映射为 rate-limit 路由键（Discord bucket 按 method + 路由模板划分）。"""
+    path = path.split("?", 1)[0]
+    path = _REACTION_EMOJI_RE.sub("/reactions/{emoji}", path)
+    return f"{method} {_MINOR_ID_RE.sub('/{id}', path)}"
+
+
+def _major_param(route: str) -> str:
+    """取路由键中的 major parameter（首个 channel/guild/webhook id），没有则为空串。"""
+    m = _MAJOR_PARAM_RE.search(route)
+    return m.group(1) if m else ""
+
+
+# 同频道并发发送合并：单批最多合并条数 / 合并后内容长度上限（Discord 2000 字符）
+_SEND_BATCH_MAX = 5
+_SEND_MERGE_MAX_LEN = 2000
+
+
+@dataclass
+class _PendingSend:
+    """排队等待发送的一条频道消息。"""
+
+    content: str
+    reply_to: str
+    embed: dict | None
+    future: asyncio.Future
+
+
+# 文件上传分块大小：每次在线程中读取 64KB，边读边发
+_UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def _multipart_file_body(
+    payload_json: str, filename: str, file_path: str, file_size: int,
+) -> tuple[str, int, AsyncIterator[bytes]]:
+    """构建流式 multipart/form-data 请求体。
+
+    返回 (Content-Type, Content-Length, 异步字节迭代器)。文件内容按块在线程中读取，
+    不会整体载入内存，也不会阻塞事件循环。
+    """
+    boundary = secrets.token_hex(16)
+    safe_name = filename.replace("\\", "\\\\").replace('"', "%22")
+    file_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    head = (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="payload_json"\r\n'
+        "Content-Type: application/json\r\n\r\n"
+        f"{payload_json}\r\n"
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{safe_name}"\r\n'
+        f"Content-Type: {file_type}\r\n\r\n"
+    ).encode("utf-8")
+    tail = f"\r\n--{boundary}--\r\n".encode("ascii")
+
+    async def _iter() -> AsyncIterator[bytes]:
+        yield head
+        f = await asyncio.to_thread(open, file_path, "rb")
+        try:
+            while chunk := await asyncio.to_thread(f.read, _UPLOAD_CHUNK_SIZE):
+                yield chunk
+        finally:
+            f.close()
+        yield tail
+
+    content_type = f"multipart/form-data; boundary={boundary}"
+    return content_type, len(head) + file_size + len(tail), _iter()
+
+
+@lru_cache(maxsize=512)
+def _encode_emoji(emoji: str) -> str:
+    """URL 编码 emoji（同一 emoji 反复出现，缓存编码结果）。"""
+    return url_quote(emoji)
+
+
+def _backoff_delay(attempt: int, base: float, cap: float, jitter: float) -> float:
+    """指数退避 + 随机抖动，避免多个协程同步重试。"""
+    return min(cap, base * (2 ** attempt)) + random.uniform(0, jitter)
+
 
 class DiscordSender:
     """Discord REST API 封装，使用 httpx 直接调用。
 
-    包含 429 rate-limit 自动重试（读 Retry-After header + JSON body）。
+    包含 429 rate-limit 自动重试（读 Retry-After header + JSON body），
+    并按 X-RateLimit-Bucket 跟踪各 bucket 剩余额度，额度耗尽时预先等待。
+    所有请求复用同一个 httpx.AsyncClient（keep-alive 连接池），关闭时调用 aclose()。
     """
 
     def __init__(self, bot_token: str, proxy: str = "") -> None:
@@ -27,6 +143,101 @@ class DiscordSender:
             "Authorization": f"Bot {bot_token}",
             "Content-Type": "application/json",
         }
+        self._http: httpx.AsyncClient | None = None
+        self._http_loop: asyncio.AbstractEventLoop | None = None
+        # rate-limit bucket 跟踪（来自 X-RateLimit-* 响应头）
+        self._route_buckets: dict[str, str] = {}  # 路由键 → bucket hash
+        # 同一 bucket hash 在不同 major parameter 下额度独立，故按 (bucket, major) 记账
+        self._buckets: dict[tuple[str, str], tuple[int, float]] = {}  # → (remaining, reset_at monotonic)
+        self._bucket_locks: dict[tuple[str, str], asyncio.Lock] = {}
+        # 每频道发送队列 + 排空协程（合并并发的短消息）
+        self._send_queues: dict[str, asyncio.Queue[_PendingSend]] = {}
+        self._send_workers: dict[str, asyncio.Task] = {}
+
+    async def _get_client(self) -> httpx.AsyncClient:
+        """返回绑定到当前事件循环的长连接 client（惰性创建）。
+
+        httpx 连接池不能跨事件循环使用：若 client 创建于其他循环则丢弃重建。
+        """
+        loop = asyncio.get_running_loop()
+        if self._http is not None and self._http_loop is not loop:
+            old = self._http
+            self._http = None
+            if not old.is_closed:
+                try:
+                    await old.aclose()
+                except Exception:
+                    logger.debug("关闭旧事件循环上的 Discord client 失败", exc_info=True)
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                proxy=self._proxy or None,
+                timeout=30.0,
+                limits=httpx.Limits(
+                    max_connections=100,
+                    max_keepalive_connections=20,
+                    keepalive_expiry=30.0,
+                ),
+            )
+            self._http_loop = loop
+        return self._http
+
+    async def aclose(self) -> None:
+        """关闭复用的 HTTP client 和发送队列（adapter disconnect 时调用）。"""
+        workers = list(self._send_workers.values())
+        self._send_workers.clear()
+        for task in workers:
+            task.cancel()
+        if workers:
+            await asyncio.gather(*workers, return_exceptions=True)
+        for queue in self._send_queues.values():
+            while not queue.empty():
+                pending = queue.get_nowait()
+                if not pending.future.done():
+                    pending.future.cancel()
+        self._send_queues.clear()
+        if self._http is not None:
+            http = self._http
+            self._http = None
+            self._http_loop = None
+            await http.aclose()
+
+    async def _wait_for_bucket(self, route: str) -> None:
+        """请求前检查路由所属 bucket：额度耗尽则等到重置，避免撞上 429。"""
+        bucket = self._route_buckets.get(route)
+        if not bucket:
+            return
+        key = (bucket, _major_param(route))
+        delay = 0.0
+        # 锁内只读写状态、算出等待时长；sleep 放到锁外，不阻塞同 bucket 的其他请求
+        async with self._bucket_locks.setdefault(key, asyncio.Lock()):
+            state = self._buckets.get(key)
+            if not state:
+                return
+            remaining, reset_at = state
+            now = time.monotonic()
+            if now >= reset_at:
+                return
+            if remaining <= 0:
+                delay = reset_at - now
+            else:
+                # 乐观扣减，使并发突发请求在 bucket 内排队
+                self._buckets[key] = (remaining - 1, reset_at)
+        if delay > 0:
+            logger.debug("Discord bucket %s 额度耗尽，预先等待 %.2f 秒", key, delay)
+            await asyncio.sleep(delay)
+
+    def _update_bucket(self, route: str, headers: httpx.Headers) -> None:
+        """根据响应头更新 bucket 状态。"""
+        bucket = headers.get("X-RateLimit-Bucket")
+        if not bucket:
+            return
+        self._route_buckets[route] = bucket
+        try:
+            remaining = int(headers.get("X-RateLimit-Remaining", "1"))
+            reset_after = float(headers.get("X-RateLimit-Reset-After", "0"))
+        except ValueError:
+            return
+        self._buckets[(bucket, _major_param(route))] = (remaining, time.monotonic() + reset_after)
 
     async def _request(
         self,
@@ -38,22 +249,33 @@ class DiscordSender:
     ) -> dict | list | bytes | None:
         """通用请求方法，包含 429 rate-limit 自动重试。"""
         url = f"{BASE_URL}{path}"
+        route = _route_key(method, path)
         resp: httpx.Response | None = None
         for attempt in range(max_retries + 1):
             try:
-                async with httpx.AsyncClient(
-                    proxy=self._proxy or None, timeout=30.0,
-                ) as http:
-                    resp = await http.request(
-                        method, url, headers=self._headers, json=json,
-                    )
+                await self._wait_for_bucket(route)
+                http = await self._get_client()
+                resp = await http.request(
+                    method, url, headers=self._headers,
+                    content=_dumps(json) if json is not None else None,
+                )
+                self._update_bucket(route, resp.headers)
                 if resp.status_code == 429:
-                    # 优先读 JSON body 中的 retry_after（更精确）
-                    try:
-                        body = resp.json()
-                        retry_after = float(body.get("retry_after", 1))
-                    except Exception:
+                    # 优先读 JSON body 中的 retry_after（更精确）；
+                    # 先看 content-type，非 JSON 响应直接读 header，不走异常路径
+                    retry_after = None
+                    if "application/json" in resp.headers.get("content-type", ""):
+                        try:
+                            retry_after = float(resp.json().get("retry_after", 1))
+                        except (ValueError, TypeError, AttributeError):
+                            pass
+                    if retry_after is None:
                         retry_after = float(resp.headers.get("Retry-After", "1"))
+                    # 以服务端 retry_after 为下限，叠加指数退避与抖动
+                    retry_after = max(retry_after, _backoff_delay(
+                        attempt, _RATE_LIMIT_BACKOFF_BASE,
+                        _RATE_LIMIT_BACKOFF_CAP, _RATE_LIMIT_BACKOFF_JITTER,
+                    ))
                     logger.warning(
                         "Discord rate-limit，等待 %.1f 秒后重试 (%d/%d)",
                         retry_after, attempt + 1, max_retries,
@@ -76,7 +298,10 @@ class DiscordSender:
                         "Discord API 网络错误，重试 (%d/%d)",
                         attempt + 1, max_retries, exc_info=True,
                     )
-                    await asyncio.sleep(1.0 * (attempt + 1))
+                    await asyncio.sleep(_backoff_delay(
+                        attempt, _NET_BACKOFF_BASE,
+                        _NET_BACKOFF_CAP, _NET_BACKOFF_JITTER,
+                    ))
                 else:
                     raise
         # rate-limit 重试耗尽
@@ -97,7 +322,92 @@ class DiscordSender:
         reply_to: str = "",
         embed: dict | None = None,
     ) -> str | None:
-        """发送消息，返回 message_id。"""
+        """发送消息，返回 message_id。
+
+        消息先进入该频道的发送队列：同一时刻并发到达的多条纯文本消息
+        （无 reply_to / embed）会合并为一次 POST，合并后的各调用方拿到同一 message_id。
+        """
+        loop = asyncio.get_running_loop()
+        pending = _PendingSend(content, reply_to, embed, loop.create_future())
+        queue = self._send_queues.get(channel_id)
+        if queue is None:
+            queue = self._send_queues[channel_id] = asyncio.Queue()
+        queue.put_nowait(pending)
+        worker = self._send_workers.get(channel_id)
+        if worker is None or worker.done():
+            self._send_workers[channel_id] = asyncio.create_task(
+                self._drain_send_queue(channel_id, queue),
+                name=f"discord-send-{channel_id}",
+            )
+        return await pending.future
+
+    async def _drain_send_queue(
+        self, channel_id: str, queue: asyncio.Queue[_PendingSend],
+    ) -> None:
+        """排空频道发送队列：每轮取出已排队的一批，合并相邻纯文本后依次发送。"""
+        batch: list[_PendingSend] = []
+        try:
+            while not queue.empty():
+                batch = [queue.get_nowait()]
+                # 让出一次事件循环，使同时触发的其他发送也能入队
+                await asyncio.sleep(0)
+                while len(batch) < _SEND_BATCH_MAX and not queue.empty():
+                    batch.append(queue.get_nowait())
+                batch = [p for p in batch if not p.future.done()]
+
+                for group in self._merge_pending(batch):
+                    head = group[0]
+                    content = "\n".join(p.content for p in group)
+                    try:
+                        msg_id = await self._post_message(
+                            channel_id, content,
+                            reply_to=head.reply_to, embed=head.embed,
+                        )
+                    except Exception as exc:
+                        for p in group:
+                            if not p.future.done():
+                                p.future.set_exception(exc)
+                        continue
+                    for p in group:
+                        if not p.future.done():
+                            p.future.set_result(msg_id)
+        except asyncio.CancelledError:
+            # aclose() 取消时本批可能已出队、正在 POST：这些请求也要结束，否则调用方永远挂起
+            for p in batch:
+                if not p.future.done():
+                    p.future.cancel()
+            raise
+        # 队列已空：退出前移除登记（与 send_message 的检查之间没有 await，不会丢消息）
+        if self._send_workers.get(channel_id) is asyncio.current_task():
+            del self._send_workers[channel_id]
+
+    @staticmethod
+    def _merge_pending(batch: list[_PendingSend]) -> list[list[_PendingSend]]:
+        """将相邻的纯文本消息分组合并（总长不超过 Discord 单条上限）。"""
+        groups: list[list[_PendingSend]] = []
+        merged_len = 0
+        for p in batch:
+            plain = not p.reply_to and not p.embed and bool(p.content)
+            if groups and plain:
+                last = groups[-1]
+                last_plain = not last[0].reply_to and not last[0].embed and bool(last[0].content)
+                if last_plain and merged_len + 1 + len(p.content) <= _SEND_MERGE_MAX_LEN:
+                    last.append(p)
+                    merged_len += 1 + len(p.content)
+                    continue
+            groups.append([p])
+            merged_len = len(p.content)
+        return groups
+
+    async def _post_message(
+        self,
+        channel_id: str,
+        content: str,
+        *,
+        reply_to: str = "",
+        embed: dict | None = None,
+    ) -> str | None:
+        """POST 单条消息，返回 message_id。"""
         body: dict[str, Any] = {}
         if content:
             body["content"] = content
@@ -121,12 +431,9 @@ class DiscordSender:
         reply_to: str = "",
     ) -> str | None:
         """发送带文件附件的消息（multipart/form-data），返回 message_id。"""
-        import os
         url = f"{BASE_URL}/channels/{channel_id}/messages"
         filename = os.path.basename(file_path)
 
-        import json as _json
-
         payload: dict[str, Any] = {}
         if content:
             payload["content"] = content
@@ -134,24 +441,25 @@ class DiscordSender:
             payload["message_reference"] = {"message_id": reply_to}
 
         try:
-            async with httpx.AsyncClient(
-                proxy=self._proxy or None, timeout=60.0,
-            ) as http:
-                with open(file_path, "rb") as f:
-                    # Discord multipart 需要用 payload_json 传复杂结构
-                    files = {
-                        "file": (filename, f),
-                        "payload_json": (None, _json.dumps(payload), "application/json"),
-                    }
-                    headers = {"Authorization": f"Bot {self._token}"}
-                    resp = await http.post(
-                        url, headers=headers, files=files,
-                    )
-                resp.raise_for_status()
-                data = resp.json()
-                msg_id = data.get("id", "")
-                logger.debug("Discord 文件消息已发送: channel=%s msg_id=%s", channel_id, msg_id)
-                return msg_id
+            http = await self._get_client()
+            # Discord multipart 需要用 payload_json 传复杂结构；文件按块流式上传
+            content_type, length, body = _multipart_file_body(
+                _json.dumps(payload), filename, file_path,
+                os.path.getsize(file_path),
+            )
+            headers = {
+                "Authorization": f"Bot {self._token}",
+                "Content-Type": content_type,
+                "Content-Length": str(length),
+            }
+            resp = await http.post(
+                url, headers=headers, content=body, timeout=60.0,
+            )
+            resp.raise_for_status()
+            data = resp.json()
+            msg_id = data.get("id", "")
+            logger.debug("Discord 文件消息已发送: channel=%s msg_id=%s", channel_id, msg_id)
+            return msg_id
         except Exception:
             logger.exception("Discord 发送文件失败: channel=%s file=%s", channel_id, file_path)
             return None
@@ -203,7 +511,7 @@ class DiscordSender:
         self, channel_id: str, message_id: str, emoji: str,
     ) -> bool:
         """添加 reaction。emoji 可以是 Unicode emoji 或 name:id 格式。"""
-        encoded = url_quote(emoji)
+        encoded = _encode_emoji(emoji)
         try:
             await self._request(
                 "PUT",
@@ -224,7 +532,7 @@ class DiscordSender:
         self, channel_id: str, message_id: str, emoji: str,
     ) -> bool:
         """移除自己的 reaction。"""
-        encoded = url_quote(emoji)
+        encoded = _encode_emoji(emoji)
         try:
             await self._request(
                 "DELETE",
@@ -307,11 +615,9 @@ class DiscordSender:
     async def download_attachment(self, url: str) -> tuple[bytes, str] | None:
         """下载附件 URL，返回 (raw_bytes, content_type) 或 None。"""
         try:
-            async with httpx.AsyncClient(
-                proxy=self._proxy or None, timeout=30.0,
-            ) as http:
-                resp = await http.get(url)
-                resp.raise_for_status()
+            http = await self._get_client()
+            resp = await http.get(url)
+            resp.raise_for_status()
             content_type = resp.headers.get("content-type", "application/octet-stream")
             return resp.content, content_type
         except Exception:
@@ -6,12 +6,20 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
+import os
 import re
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from pathlib import Path
 
+try:  # 可选加速（speed extra）：orjson 直接解析 bytes，比标准库快数倍
+    import orjson as _orjson
+except ImportError:
+    _orjson = None
+
 logger = logging.getLogger(__name__)
 
 CST = timezone(timedelta(hours=8))
@@ -30,7 +38,13 @@ _TOOL_NAMES = [
     "detect_drift",
 ]
 
-_TOOL_PAT = r"(" + "|".join(_TOOL_NAMES) + r")"
+# 按长度降序排列，避免短名前缀抢先匹配；两侧用 ASCII 标识符边界锚定。
+# 注意不能用 \b：Unicode 模式下中文也是 \w，"调用了run_bash" 中间没有 \b 边界。
+_TOOL_PAT = (
+    r"(?<![A-Za-z0-9_])("
+    + "|".join(sorted(_TOOL_NAMES, key=len, reverse=True))
+    + r")(?![A-Za-z0-9_])"
+)
 
 # ── 默认漂移规则 ──
 
@@ -75,6 +89,36 @@ _DEFAULT_RULES: list[dict] = [
 ]
 
 
+@lru_cache(maxsize=256)
+def _compile_pattern(pattern: str) -> re.Pattern[str]:
+    """编译单条忽略大小写的 pattern（带缓存）。"""
+    return re.compile(pattern, re.IGNORECASE)
+
+
+def _longest_snippet(text: str, patterns: list[str]) -> str | None:
+    """按顺序取第一个有命中的 pattern，返回它在全文中最长的一次匹配。"""
+    for pattern in patterns:
+        best = max((m.group(0) for m in _compile_pattern(pattern).finditer(text)), key=len, default=None)
+        if best is not None:
+            return best
+    return None
+
+
+# 内置规则在模块加载时融合为单个命名分组正则：一次 finditer 扫描即可判断哪些规则命中，
+# 命中的分组名（m.lastgroup）即规则名。内置规则的 pattern 互不重叠，
+# 因此单次扫描不会因前一个匹配吞掉文本而漏报。融合扫描只报最左匹配，
+# 命中规则的 snippet 仍按逐条 pattern 取最长匹配。
+_MASTER_RE = re.compile(
+    "|".join(
+        "(?P<{}>{})".format(r["rule"], "|".join(f"(?:{p})" for p in r["patterns"]))
+        for r in _DEFAULT_RULES
+    ),
+    re.IGNORECASE,
+)
+_RULE_META: dict[str, dict] = {r["rule"]: r for r in _DEFAULT_RULES}
+_RULE_ORDER: dict[str, int] = {r["rule"]: i for i, r in enumerate(_DEFAULT_RULES)}
+
+
 def check_drift(
     text: str,
     custom_rules: list[dict] | None = None,
@@ -90,25 +134,146 @@ def check_drift(
     custom_rules : list[dict] | None
         额外的自定义规则，格式同 _DEFAULT_RULES。
     """
-    rules = _DEFAULT_RULES + (custom_rules or [])
+    # 内置规则：单次扫描找出命中的规则（无漂移的常见情况到此为止）
+    hit: set[str] = set()
+    for m in _MASTER_RE.finditer(text):
+        if m.lastgroup:
+            hit.add(m.lastgroup)
+            if len(hit) == len(_RULE_META):
+                break
+
     violations: list[dict] = []
+    for name in sorted(hit, key=_RULE_ORDER.__getitem__):
+        meta = _RULE_META[name]
+        snippet = _longest_snippet(text, meta["patterns"])
+        if snippet is None:
+            continue
+        violations.append({
+            "rule": name,
+            "desc": meta["desc"],
+            "severity": meta["severity"],
+            "snippet": snippet,
+        })
 
-    for rule in rules:
-        for pattern in rule["patterns"]:
-            matches = list(re.finditer(pattern, text, re.IGNORECASE))
-            if matches:
-                longest = max(matches, key=lambda m: len(m.group(0)))
-                violations.append({
-                    "rule": rule["rule"],
-                    "desc": rule["desc"],
-                    "severity": rule["severity"],
-                    "snippet": longest.group(0),
-                })
-                break  # 同一规则只报一次
+    # 自定义规则：逐条扫描（pattern 编译结果有缓存），同一规则只报一次
+    for rule in custom_rules or []:
+        snippet = _longest_snippet(text, rule["patterns"])
+        if snippet is not None:
+            violations.append({
+                "rule": rule["rule"],
+                "desc": rule["desc"],
+                "severity": rule["severity"],
+                "snippet": snippet,
+            })
 
     return violations
 
 
+_SCAN_CONCURRENCY = 16  # 异步扫描时同时处理的文件数上限（避免 fd 耗尽）
+
+
+def _process_file(path: Path, cutoff_ts: float) -> tuple[int, list[dict]]:
+    """扫描单个 session 文件，返回 (回复数, 违规列表)。纯函数，可在线程中执行。"""
+    try:
+        raw = path.read_bytes()
+        data = _orjson.loads(raw) if _orjson else json.loads(raw)
+    except (ValueError, OSError):
+        return 0, []
+
+    total_replies = 0
+    file_violations: list[dict] = []
+    messages = data.get("messages", [])
+    for msg in messages:
+        if msg.get("role") != "assistant":
+            continue
+        # 跳过工具调用记录
+        if msg.get("is_tool_use"):
+            continue
+        ts = msg.get("timestamp", 0)
+        if ts < cutoff_ts:
+            continue
+
+        content = msg.get("content", "")
+        if isinstance(content, list):
+            # content blocks — 只收集文本块（tool_use 等直接跳过），
+            # 先累计长度，过短的回复不必拼接字符串
+            parts: list[str] = []
+            total = 0
+            for b in content:
+                if isinstance(b, dict) and b.get("type") == "text":
+                    t = b.get("text", "")
+                    parts.append(t)
+                    total += len(t)
+            if total + max(len(parts) - 1, 0) < 10:
+                continue
+            content = " ".join(parts)
+        elif not content or len(content) < 10:
+            continue
+
+        total_replies += 1
+        violations = check_drift(content)
+        for v in violations:
+            v["session"] = path.stem
+            file_violations.append(v)
+
+    return total_replies, file_violations
+
+
+def _recent_session_files(session_dir: Path, cutoff_ts: float) -> list[Path]:
+    """列出截止时间之后修改过的 session 文件。
+
+    用 os.scandir 枚举，DirEntry 自带类型信息且 stat 结果会被缓存；
+    最后修改早于截止时间的文件中所有消息都更早，无需读取。
+    """
+    paths: list[Path] = []
+    try:
+        with os.scandir(session_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    if entry.stat(follow_symlinks=False).st_mtime < cutoff_ts:
+                        continue
+                except OSError:
+                    continue
+                paths.append(Path(entry.path))
+    except OSError:
+        return []
+    return paths
+
+
+def _scan_cutoff(days: int) -> tuple[int, float]:
+    """规范化天数并计算截止时间戳。"""
+    days = max(1, min(days, 7))
+    cutoff = datetime.now(CST) - timedelta(days=days)
+    return days, cutoff.timestamp()
+
+
+def _build_report(
+    days: int, results: list[tuple[int, list[dict]]],
+) -> dict:
+    """汇总各文件的扫描结果。"""
+    total_replies = 0
+    all_violations: list[dict] = []
+    for count, violations in results:
+        total_replies += count
+        all_violations.extend(violations)
+
+    summary = {"high": 0, "medium": 0, "low": 0}
+    for v in all_violations:
+        summary[v["severity"]] += 1
+
+    return {
+        "scan_range": f"最近 {days} 天",
+        "total_replies": total_replies,
+        "violations": all_violations,
+        "summary": summary,
+        "clean": len(all_violations) == 0,
+    }
+
+
 def scan_session_replies(
     session_dir: Path,
     days: int = 1,
@@ -133,64 +298,29 @@ def scan_session_replies(
             "clean": bool,
         }
     """
-    days = max(1, min(days, 7))
-    now = datetime.now(CST)
-    cutoff = now - timedelta(days=days)
-    cutoff_ts = cutoff.timestamp()
-
-    total_replies = 0
-    all_violations: list[dict] = []
-
-    if not session_dir.exists():
-        return {
-            "scan_range": f"最近 {days} 天",
-            "total_replies": 0,
-            "violations": [],
-            "summary": {"high": 0, "medium": 0, "low": 0},
-            "clean": True,
-        }
-
-    for f in session_dir.glob("*.json"):
-        try:
-            data = json.loads(f.read_text(encoding="utf-8"))
-        except (json.JSONDecodeError, OSError):
-            continue
+    days, cutoff_ts = _scan_cutoff(days)
+    results = [
+        _process_file(f, cutoff_ts)
+        for f in _recent_session_files(session_dir, cutoff_ts)
+    ]
+    return _build_report(days, results)
 
-        messages = data.get("messages", [])
-        for msg in messages:
-            if msg.get("role") != "assistant":
-                continue
-            # 跳过工具调用记录
-            if msg.get("is_tool_use"):
-                continue
-            ts = msg.get("timestamp", 0)
-            if ts < cutoff_ts:
-                continue
 
-            content = msg.get("content", "")
-            if isinstance(content, list):
-                # content blocks — 提取文本
-                content = " ".join(
-                    b.get("text", "") for b in content
-                    if isinstance(b, dict) and b.get("type") == "text"
-                )
-            if not content or len(content) < 10:
-                continue
+async def scan_session_replies_async(
+    session_dir: Path,
+    days: int = 1,
+) -> dict:
+    """scan_session_replies 的异步版本：文件读取与解析分发到线程池并行执行。
 
-            total_replies += 1
-            violations = check_drift(content)
-            for v in violations:
-                v["session"] = f.stem
-                all_violations.append(v)
+    返回格式同 scan_session_replies。
+    """
+    days, cutoff_ts = _scan_cutoff(days)
+    paths = await asyncio.to_thread(_recent_session_files, session_dir, cutoff_ts)
+    sem = asyncio.Semaphore(_SCAN_CONCURRENCY)
 
-    summary = {"high": 0, "medium": 0, "low": 0}
-    for v in all_violations:
-        summary[v["severity"]] += 1
+    async def _run(path: Path) -> tuple[int, list[dict]]:
+        async with sem:
+            return await asyncio.to_thread(_process_file, path, cutoff_ts)
 
-    return {
-        "scan_range": f"最近 {days} 天",
-        "total_replies": total_replies,
-        "violations": all_violations,
-        "summary": summary,
-        "clean": len(all_violations) == 0,
-    }
+    results = await asyncio.gather(*(_run(p) for p in paths))
+    return _build_report(days, list(results))
@@ -13,12 +13,24 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
+import os
 import re
 import subprocess
+import sys
+import time
+from collections import deque
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from pathlib import Path
+from typing import Any
+
+try:  # 可选加速（speed extra）：orjson 序列化状态文件
+    import orjson as _orjson
+except ImportError:
+    _orjson = None
 
 logger = logging.getLogger(__name__)
 
@@ -30,9 +42,43 @@ COMPACT_FAILED_THRESHOLD = 5
 COMPACT_KEEP_COMPLETED = 5
 COMPACT_KEEP_FAILED = 3
 
+# ── 归档轮转 ──
+# EVOLUTION.md 超过该大小时，把较旧的「已完成」「失败记录」条目移入 EVOLUTION.archive.md
+EVOLUTION_MAX_BYTES = 256 * 1024
+# 条目标题日期早于这么多天才会被归档（无日期的条目始终保留）
+EVOLUTION_ARCHIVE_AFTER_DAYS = 30
+_ENTRY_DATE_RE = re.compile(r"### (\d{4}-\d{2}-\d{2})")
+
+# 新写入 EVOLUTION.md 的条目先按这些模式脱敏（先匹配更具体的前缀）；
+# 左边界防止把 disk-usage-... 之类普通单词里的 sk- 误判为密钥
+_SECRET_PATTERNS: list[tuple[re.Pattern[str], str]] = [
+    (re.compile(r"(?<![A-Za-z0-9])sk-ant-[A-Za-z0-9_-]{20,}"), "[REDACTED:anthropic_key]"),
+    (re.compile(r"(?<![A-Za-z0-9])sk-[A-Za-z0-9_-]{20,}"), "[REDACTED:api_key]"),
+    (re.compile(r"(?<![A-Za-z0-9])gh[pousr]_[A-Za-z0-9]{30,}"), "[REDACTED:github_token]"),
+    (re.compile(r"(?<![A-Za-z0-9])AKIA[0-9A-Z]{16}"), "[REDACTED:aws_key]"),
+    (re.compile(r"(?i)(bearer\s+)[A-Za-z0-9._~+/-]{20,}=*"), r"\1[REDACTED:token]"),
+]
+
+# 源码摘要 / git log 缓存有效期（秒）：心跳频繁调用，而源码树很少变化
+SOURCE_INFO_CACHE_TTL = 60.0
+
+# 错误日志扫描：只看最后 N 行；读取时最多回溯文件末尾这么多字节
+ERROR_SCAN_TAIL_LINES = 500
+ERROR_SCAN_TAIL_BYTES = 256 * 1024
+
+# 日志格式: 2026-02-20 17:27:54,940 [WARNING] lq.gateway: 配置一致性警告: ...
+_LOG_ERROR_RE = re.compile(
+    r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d+ '
+    r'\[(ERROR|WARNING)\] ([\w.]+): (.+)'
+)
+
+# git HEAD 缓存有效期（秒）：同一轮操作内的多次查询只 fork 一次 git
+GIT_HEAD_CACHE_TTL = 2.0
+
 CST = timezone(timedelta(hours=8))
 
 
+@lru_cache(maxsize=1)
 def _find_source_root() -> Path | None:
     """从已安装的 lq 包反推 lingque 仓库根目录。
 
@@ -50,6 +96,66 @@ def _find_source_root() -> Path | None:
     return None
 
 
+def _tail_lines(path: Path, n: int, max_bytes: int = ERROR_SCAN_TAIL_BYTES) -> list[str]:
+    """读取文件最后 n 行，内存占用与文件大小无关。
+
+    大文件先 seek 到末尾 max_bytes 处（丢弃被截断的首行），
+    再用定长 deque 流式保留最后 n 行。
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size > max_bytes:
+            f.seek(size - max_bytes)
+            f.readline()  # 丢弃不完整的首行
+        tail = deque(f, maxlen=n)
+    return [line.decode("utf-8", errors="ignore").rstrip("\r\n") for line in tail]
+
+
+def _redact_secrets(text: str) -> str:
+    """把文本中形似 API key / token 的片段替换为占位符。"""
+    for pattern, repl in _SECRET_PATTERNS:
+        text = pattern.sub(repl, text)
+    return text
+
+
+def _atomic_write_bytes(path: Path, data: bytes) -> None:
+    """先写同目录临时文件再 os.replace，崩溃时磁盘上只会是旧内容或新内容。"""
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _dumps_json(obj: Any) -> bytes:
+    return _orjson.dumps(obj) if _orjson else json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def _scan_py_files(
+    directory: str, prefix: tuple[str, ...] = (),
+) -> list[tuple[tuple[str, ...], int]]:
+    """递归列出目录下的 .py 文件，返回 [(相对路径各段, 字节数), …]。
+
+    使用 os.scandir：DirEntry 自带类型信息，stat 结果被缓存，
+    比 Path.rglob + 逐文件 stat 少一轮系统调用。
+    不跟随目录符号链接，跳过 __pycache__ 与隐藏目录（其中没有源码，只会白白多一轮 scandir）。
+    """
+    result: list[tuple[tuple[str, ...], int]] = []
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name == "__pycache__" or entry.name.startswith("."):
+                            continue
+                        result.extend(_scan_py_files(entry.path, prefix + (entry.name,)))
+                    elif entry.name.endswith(".py") and entry.is_file():
+                        result.append((prefix + (entry.name,), entry.stat().st_size))
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return result
+
+
 class EvolutionEngine:
     """管理自进化状态和日频率限制。
 
@@ -64,10 +170,22 @@ class EvolutionEngine:
         self.max_daily = max_daily
         self.source_root = _find_source_root()
         self.evolution_path = workspace / "EVOLUTION.md"
+        self.archive_path = workspace / "EVOLUTION.archive.md"
         self._state_path = workspace / "evolution-state.json"
         self._checkpoint_path = workspace / "evolution-checkpoint.json"
         self._today_count = 0
         self._last_date = ""
+        # 今日日期字符串缓存，到下一个 CST 零点（epoch 秒）失效
+        self._today_str = ""
+        self._today_str_expiry = 0.0
+        # 内存状态是否有未落盘的变更（跨日重置只标脏，由 flush_state 写入）
+        self._dirty = False
+        # (写入时刻 monotonic, 源码目录 mtime, 摘要)
+        self._src_cache: tuple[float, float, str] | None = None
+        # n → (写入时刻 monotonic, git log 输出)
+        self._git_cache: dict[int, tuple[float, str]] = {}
+        # (写入时刻 monotonic, HEAD hash)
+        self._head_cache: tuple[float, str] | None = None
         self._load_state()
 
     # ── 状态持久化 ──
@@ -76,7 +194,8 @@ class EvolutionEngine:
         if not self._state_path.exists():
             return
         try:
-            data = json.loads(self._state_path.read_text(encoding="utf-8"))
+            raw = self._state_path.read_bytes()
+            data = _orjson.loads(raw) if _orjson else json.loads(raw)
             self._last_date = data.get("date", "")
             self._today_count = data.get("count", 0)
         except Exception:
@@ -84,40 +203,53 @@ class EvolutionEngine:
 
     def _save_state(self) -> None:
         try:
-            self._state_path.write_text(
-                json.dumps({"date": self._last_date, "count": self._today_count}),
-                encoding="utf-8",
-            )
+            state = {"date": self._last_date, "count": self._today_count}
+            _atomic_write_bytes(self._state_path, _dumps_json(state))
+            self._dirty = False
         except Exception:
             logger.warning("进化状态保存失败")
 
+    def flush_state(self) -> None:
+        """将未落盘的状态写入磁盘（gateway 关闭时调用）。"""
+        if self._dirty:
+            self._save_state()
+
+    def _today(self) -> str:
+        """返回 CST 今日日期（YYYY-MM-DD），缓存到下一个零点。"""
+        if time.time() >= self._today_str_expiry:
+            now = datetime.now(CST)
+            self._today_str = now.strftime("%Y-%m-%d")
+            midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+            self._today_str_expiry = (midnight + timedelta(days=1)).timestamp()
+        return self._today_str
+
     # ── 频率控制 ──
 
     def can_evolve(self) -> bool:
         """检查是否可以执行进化（每日限制未超）"""
-        today = datetime.now(CST).strftime("%Y-%m-%d")
+        today = self._today()
         if self._last_date != today:
-            # 新的一天，重置计数
+            # 新的一天，重置计数（旧日期的持久化状态加载后同样视为 0，无需立即写盘）
             self._last_date = today
             self._today_count = 0
-            self._save_state()
+            self._dirty = True
         return self._today_count < self.max_daily
 
     def record_attempt(self) -> None:
         """记录一次进化尝试（成功才计数）"""
-        today = datetime.now(CST).strftime("%Y-%m-%d")
+        today = self._today()
         if self._last_date != today:
             self._last_date = today
             self._today_count = 0
         self._today_count += 1
+        # 计数是每日上限的依据，进化后可能紧接着崩溃重启，必须立即落盘（每天至多 max_daily 次）
         self._save_state()
         logger.info("进化计数: %d/%d", self._today_count, self.max_daily)
 
     @property
     def remaining_today(self) -> int:
         """今日剩余可进化次数"""
-        today = datetime.now(CST).strftime("%Y-%m-%d")
-        if self._last_date != today:
+        if self._last_date != self._today():
             return self.max_daily
         return max(0, self.max_daily - self._today_count)
 
@@ -127,9 +259,16 @@ class EvolutionEngine:
         """确保 EVOLUTION.md 存在，不存在则创建初始模板"""
         if not self.evolution_path.exists():
             from lq.prompts import EVOLUTION_INIT_TEMPLATE
-            self.evolution_path.write_text(EVOLUTION_INIT_TEMPLATE, encoding="utf-8")
+            self._write_evolution(EVOLUTION_INIT_TEMPLATE)
             logger.info("已创建 EVOLUTION.md")
 
+    def _write_evolution(self, content: str) -> None:
+        """原子替换 EVOLUTION.md：先写临时文件再 os.replace，中途崩溃不会留下半截文件。
+
+        不对全文脱敏（已有历史在写入时脱敏过）；新内容由调用方先经 _redact_secrets。
+        """
+        _atomic_write_bytes(self.evolution_path, content.encode("utf-8"))
+
     def read_evolution(self) -> str:
         """读取 EVOLUTION.md 内容"""
         self.ensure_evolution_file()
@@ -239,7 +378,7 @@ class EvolutionEngine:
                 recent = entries[-COMPACT_KEEP_COMPLETED:]
                 new_body = (
                     preamble.rstrip("\n") + "\n\n"
-                    + completed_summary.strip() + "\n\n"
+                    + _redact_secrets(completed_summary.strip()) + "\n\n"
                     + "\n".join(f"### {e}" for e in recent)
                 )
                 new_sections.append((heading, new_body))
@@ -248,18 +387,72 @@ class EvolutionEngine:
                 recent = entries[-COMPACT_KEEP_FAILED:]
                 new_body = (
                     preamble.rstrip("\n") + "\n\n"
-                    + failed_summary.strip() + "\n\n"
+                    + _redact_secrets(failed_summary.strip()) + "\n\n"
                     + "\n".join(f"### {e}" for e in recent)
                 )
                 new_sections.append((heading, new_body))
             else:
                 new_sections.append((heading, body))
 
-        self.evolution_path.write_text(
-            self._rebuild_from_sections(new_sections), encoding="utf-8",
-        )
+        self._write_evolution(self._rebuild_from_sections(new_sections))
         logger.info("EVOLUTION.md 已压缩")
 
+    # ── EVOLUTION.md 归档轮转 ──
+
+    def rotate_evolution(self) -> int:
+        """EVOLUTION.md 超过 EVOLUTION_MAX_BYTES 时，将旧条目移入 EVOLUTION.archive.md。
+
+        只处理「已完成」和「失败记录」中标题带日期、且早于
+        EVOLUTION_ARCHIVE_AFTER_DAYS 天的条目；归档文件只追加不重写。
+        返回归档的条目数。
+        """
+        try:
+            if self.evolution_path.stat().st_size <= EVOLUTION_MAX_BYTES:
+                return 0
+        except OSError:
+            return 0
+
+        cutoff = (datetime.now(CST) - timedelta(days=EVOLUTION_ARCHIVE_AFTER_DAYS)).strftime("%Y-%m-%d")
+        new_sections: list[tuple[str, str]] = []
+        archived: list[tuple[str, list[str]]] = []
+        for heading, body in self._parse_sections():
+            if heading not in ("已完成", "失败记录"):
+                new_sections.append((heading, body))
+                continue
+            preamble, entries = self._split_entries(body)
+            head: list[str] = [preamble]
+            if preamble.startswith("### "):
+                # 段落紧接条目开头（回滚记录就是这样插入的）时，首个条目会落在前言里
+                head, entries = [], [preamble, *entries]
+            keep: list[str] = []
+            old: list[str] = []
+            for entry in entries:
+                m = _ENTRY_DATE_RE.match(entry)
+                (old if m and m.group(1) < cutoff else keep).append(entry)
+            if old:
+                archived.append((heading, old))
+                body = "\n".join([*head, *keep])
+                if body and not body.endswith("\n"):
+                    body += "\n"
+            new_sections.append((heading, body))
+
+        if not archived:
+            logger.debug("EVOLUTION.md 超过 %d 字节，但没有可归档的旧条目", EVOLUTION_MAX_BYTES)
+            return 0
+
+        stamp = datetime.now(CST).strftime("%Y-%m-%d %H:%M")
+        chunks = []
+        for heading, entries in archived:
+            chunks.append(f"\n## {heading}（归档于 {stamp}）\n")
+            chunks.extend(e if e.endswith("\n") else e + "\n" for e in entries)
+        # 先追加归档再重写正文：中途失败最多在归档里多一份重复，不会丢条目
+        with open(self.archive_path, "a", encoding="utf-8") as f:
+            f.write("".join(chunks))
+        self._write_evolution(self._rebuild_from_sections(new_sections))
+        count = sum(len(entries) for _, entries in archived)
+        logger.info("EVOLUTION.md 已轮转：%d 条旧记录移入 %s", count, self.archive_path.name)
+        return count
+
     # ── 源代码信息 ──
 
     def get_source_summary(self) -> str:
@@ -271,9 +464,17 @@ class EvolutionEngine:
             return "（无法定位源代码目录，可能不是可编辑安装）"
 
         src_dir = self.source_root / "src" / "lq"
-        if not src_dir.exists():
+        try:
+            src_mtime = src_dir.stat().st_mtime
+        except OSError:
             return f"（源代码目录不存在: {src_dir}）"
 
+        # TTL 内且目录未增删文件 → 直接复用
+        now = time.monotonic()
+        cached = self._src_cache
+        if cached and now - cached[0] < SOURCE_INFO_CACHE_TTL and cached[1] == src_mtime:
+            return cached[2]
+
         lines = [
             f"仓库根目录: {self.source_root}",
             f"包目录: {src_dir}",
@@ -281,44 +482,112 @@ class EvolutionEngine:
             "文件结构:",
         ]
 
-        for p in sorted(src_dir.rglob("*.py")):
-            rel = p.relative_to(src_dir)
-            size = p.stat().st_size
-            lines.append(f"  {rel} ({size} 字节)")
+        for parts, size in sorted(_scan_py_files(str(src_dir))):
+            lines.append(f"  {'/'.join(parts)} ({size} 字节)")
+
+        summary = "\n".join(lines)
+        self._src_cache = (now, src_mtime, summary)
+        return summary
 
-        return "\n".join(lines)
+    def invalidate_source_summary(self) -> None:
+        """丢弃源码摘要与 git log 缓存（刚修改或提交了源码时调用）。"""
+        self._src_cache = None
+        self._git_cache.clear()
 
     def get_recent_git_log(self, n: int = 10) -> str:
         """获取最近的 git 提交历史（同步调用，仅用于构建 prompt）"""
         if not self.source_root or not (self.source_root / ".git").exists():
             return "（非 git 仓库）"
-        try:
-            result = subprocess.run(
-                ["git", "log", "--oneline", f"-{n}"],
-                capture_output=True, text=True, cwd=str(self.source_root),
-                timeout=5,
-            )
+        now = time.monotonic()
+        cached = self._git_cache.get(n)
+        if cached and now - cached[0] < SOURCE_INFO_CACHE_TTL:
+            return cached[1]
+        log = self._git_log_inprocess(n)
+        if log is None:
+            try:
+                result = subprocess.run(
+                    ["git", "log", "--oneline", f"-{n}"],
+                    capture_output=True, text=True, cwd=str(self.source_root),
+                    timeout=5,
+                )
+            except Exception:
+                return "（git log 获取失败）"
             if result.returncode == 0 and result.stdout.strip():
-                return result.stdout.strip()
-            return "（无提交历史）"
+                log = result.stdout.strip()
+            else:
+                log = "（无提交历史）"
+        self._git_cache[n] = (now, log)
+        return log
+
+    async def get_source_summary_async(self) -> str:
+        """get_source_summary 的异步版本：在线程中遍历源码目录，不阻塞事件循环。"""
+        return await asyncio.to_thread(self.get_source_summary)
+
+    async def get_recent_git_log_async(self, n: int = 10) -> str:
+        """get_recent_git_log 的异步版本：pygit2 读取或 git 子进程都放到线程中执行。"""
+        return await asyncio.to_thread(self.get_recent_git_log, n)
+
+    def _open_repo(self) -> Any | None:
+        """打开源码仓库的 pygit2 Repository；pygit2 未安装或打开失败返回 None。"""
+        if not self.source_root:
+            return None
+        try:
+            import pygit2
+        except ImportError:
+            return None
+        try:
+            return pygit2.Repository(str(self.source_root))
         except Exception:
-            return "（git log 获取失败）"
+            logger.debug("pygit2 打开仓库失败", exc_info=True)
+            return None
+
+    def _git_log_inprocess(self, n: int) -> str | None:
+        """用 pygit2（可选依赖）在进程内读取提交历史，免去 fork git 子进程。
+
+        输出格式同 ``git log --oneline``。pygit2 未安装或读取失败时返回 None，
+        由调用方回退到子进程。
+        """
+        repo = self._open_repo()
+        if repo is None:
+            return None
+        import pygit2
+        try:
+            if repo.head_is_unborn:
+                return "（无提交历史）"
+            lines: list[str] = []
+            for commit in repo.walk(repo.head.target, pygit2.GIT_SORT_TIME):
+                if len(lines) >= n:
+                    break
+                subject = commit.message.splitlines()[0] if commit.message else ""
+                lines.append(f"{str(commit.id)[:7]} {subject}")
+            return "\n".join(lines) or "（无提交历史）"
+        except Exception:
+            logger.debug("pygit2 读取提交历史失败，回退 git 子进程", exc_info=True)
+            return None
 
     # ── 进化守护：checkpoint / 健康检查 / 自动回滚 ──
 
     def _git_head(self) -> str | None:
-        """获取当前 git HEAD commit hash"""
+        """获取当前 git HEAD commit hash（短 TTL 缓存）"""
         if not self.source_root:
             return None
+        now = time.monotonic()
+        cached = self._head_cache
+        if cached and now - cached[0] < GIT_HEAD_CACHE_TTL:
+            return cached[1]
         try:
             r = subprocess.run(
                 ["git", "rev-parse", "HEAD"],
                 capture_output=True, text=True,
                 cwd=str(self.source_root), timeout=5,
             )
-            return r.stdout.strip() if r.returncode == 0 else None
         except Exception:
             return None
+        if r.returncode != 0:
+            return None
+        head = r.stdout.strip()
+        self._head_cache = (now, head)
+        return head
 
     def save_checkpoint(self) -> None:
         """进化前保存当前 commit 为安全点。
@@ -333,10 +602,11 @@ class EvolutionEngine:
             "commit": commit,
             "timestamp": datetime.now(CST).isoformat(),
         }
-        self._checkpoint_path.write_text(
-            json.dumps(data, ensure_ascii=False), encoding="utf-8",
-        )
+        # checkpoint 是崩溃回滚的依据，必须在进化开始前落盘，不能延迟合并写入
+        _atomic_write_bytes(self._checkpoint_path, _dumps_json(data))
         logger.info("进化 checkpoint 已保存: %s", commit[:8])
+        # 接下来的进化会产生新提交，HEAD 缓存作废
+        self._head_cache = None
 
     def clear_checkpoint(self) -> None:
         """清除 checkpoint（进化已验证安全）"""
@@ -392,7 +662,8 @@ class EvolutionEngine:
 
     def _read_checkpoint(self) -> dict | None:
         try:
-            return json.loads(self._checkpoint_path.read_text(encoding="utf-8"))
+            raw = self._checkpoint_path.read_bytes()
+            return _orjson.loads(raw) if _orjson else json.loads(raw)
         except Exception:
             logger.warning("checkpoint 文件损坏")
             return None
@@ -409,20 +680,32 @@ class EvolutionEngine:
             "from lq.memory import MemoryManager",
             "from lq.session import SessionManager",
         ]
-        for stmt in checks:
-            try:
-                r = subprocess.run(
-                    ["python", "-c", stmt],
-                    capture_output=True, text=True,
-                    cwd=str(self.source_root) if self.source_root else None,
-                    timeout=15,
-                )
-                if r.returncode != 0:
-                    logger.error("健康检查失败 [%s]: %s", stmt, r.stderr.strip()[:200])
-                    return False
-            except Exception as e:
-                logger.error("健康检查异常 [%s]: %s", stmt, e)
-                return False
+        # 在一个全新解释器中依次执行全部导入（当前进程的 sys.modules 已缓存旧代码，
+        # 不能用进程内 import 验证），只付一次解释器启动开销；
+        # 失败时把出错语句写到 stderr 首行。
+        script = (
+            "import sys, traceback\n"
+            f"for stmt in {checks!r}:\n"
+            "    try:\n"
+            "        exec(stmt)\n"
+            "    except BaseException:\n"
+            "        sys.stderr.write(stmt + '\\n' + traceback.format_exc())\n"
+            "        sys.exit(1)\n"
+        )
+        try:
+            r = subprocess.run(
+                [sys.executable, "-c", script],
+                capture_output=True, text=True,
+                cwd=str(self.source_root) if self.source_root else None,
+                timeout=30,
+            )
+        except Exception as e:
+            logger.error("健康检查异常: %s", e)
+            return False
+        if r.returncode != 0:
+            stmt, _, detail = r.stderr.partition("\n")
+            logger.error("健康检查失败 [%s]: %s", stmt, detail.strip()[-200:])
+            return False
         return True
 
     def _rollback(self, safe_commit: str, checkpoint_ts: str) -> None:
@@ -432,21 +715,35 @@ class EvolutionEngine:
             self.clear_checkpoint()
             return
 
-        # 获取当前 HEAD 用于失败记录
-        bad_commit = self._git_head() or "unknown"
+        inprocess = self._rollback_inprocess(safe_commit)
+        if inprocess is not None:
+            bad_commit, evolution_info = inprocess
+            self._record_rollback_failure(safe_commit, bad_commit, checkpoint_ts, evolution_info)
+            self.clear_checkpoint()
+            return
 
-        # 获取进化提交的信息（用于失败记录）
+        # 一次 git log 同时拿到当前 HEAD（首行）和被回滚的进化提交列表（用于失败记录）
+        bad_commit = ""
         evolution_info = ""
         try:
             r = subprocess.run(
-                ["git", "log", "--oneline", f"{safe_commit}..HEAD"],
+                ["git", "log", "--format=%H%x00%h%x00%s", f"{safe_commit}..HEAD"],
                 capture_output=True, text=True,
                 cwd=str(self.source_root), timeout=5,
             )
             if r.returncode == 0 and r.stdout.strip():
-                evolution_info = r.stdout.strip()
+                oneline: list[str] = []
+                for line in r.stdout.strip().splitlines():
+                    full, short, subject = (line.split("\x00") + ["", ""])[:3]
+                    if not bad_commit:
+                        bad_commit = full
+                    oneline.append(f"{short} {subject}")
+                evolution_info = "\n".join(oneline)
         except Exception:
             pass
+        if not bad_commit:
+            # 区间为空（HEAD 即安全点）或 git log 失败 → 单独查询 HEAD
+            bad_commit = self._git_head() or "unknown"
 
         # 执行回滚
         try:
@@ -457,6 +754,8 @@ class EvolutionEngine:
             )
             if r.returncode == 0:
                 logger.info("已回滚到 %s", safe_commit[:8])
+                self._head_cache = None
+                self.invalidate_source_summary()
             else:
                 logger.error("git reset 失败: %s", r.stderr.strip())
         except Exception as e:
@@ -466,6 +765,34 @@ class EvolutionEngine:
         self._record_rollback_failure(safe_commit, bad_commit, checkpoint_ts, evolution_info)
         self.clear_checkpoint()
 
+    def _rollback_inprocess(self, safe_commit: str) -> tuple[str, str] | None:
+        """用 pygit2 在进程内完成回滚：读取 HEAD、列出被回滚提交并 reset --hard。
+
+        返回 (坏提交, 被回滚提交列表)；pygit2 不可用或任一步失败返回 None，
+        由调用方回退到 git 子进程（reset 之前失败不会改动工作区）。
+        """
+        repo = self._open_repo()
+        if repo is None:
+            return None
+        import pygit2
+        try:
+            safe_oid = repo.revparse_single(safe_commit).id
+            head_oid = repo.head.target
+            walker = repo.walk(head_oid, pygit2.GIT_SORT_TOPOLOGICAL | pygit2.GIT_SORT_TIME)
+            walker.hide(safe_oid)
+            oneline: list[str] = []
+            for commit in walker:
+                subject = commit.message.splitlines()[0] if commit.message else ""
+                oneline.append(f"{str(commit.id)[:7]} {subject}")
+            repo.reset(safe_oid, pygit2.GIT_RESET_HARD)
+        except Exception:
+            logger.debug("pygit2 回滚失败，回退 git 子进程", exc_info=True)
+            return None
+        logger.info("已回滚到 %s", safe_commit[:8])
+        self._head_cache = None
+        self.invalidate_source_summary()
+        return str(head_oid), "\n".join(oneline)
+
     def _record_rollback_failure(
         self, safe_commit: str, bad_commit: str,
         checkpoint_ts: str, evolution_info: str,
@@ -486,16 +813,19 @@ class EvolutionEngine:
                 entry += f"  - `{line}`\n"
         entry += "- 原因: 启动健康检查失败（上次进化后崩溃）\n"
         entry += "- **教训**: 需要更仔细的验证，避免类似改动\n"
+        entry = _redact_secrets(entry)
 
         content = self.evolution_path.read_text(encoding="utf-8")
         # 插入到「失败记录」部分
         marker = "## 失败记录"
         if marker in content:
-            content = content.replace(marker, marker + entry, 1)
+            self._write_evolution(content.replace(marker, marker + entry, 1))
         else:
-            content += f"\n{marker}{entry}"
-        self.evolution_path.write_text(content, encoding="utf-8")
+            # 没有该段落 → 直接追加到文件末尾，无需重写全文
+            with open(self.evolution_path, "a", encoding="utf-8") as f:
+                f.write(f"\n{marker}{entry}")
         logger.info("回滚失败经验已记录到 EVOLUTION.md")
+        self.rotate_evolution()
 
 # 这是要追加到 EvolutionEngine 类末尾的方法
 # 使用 cat >> 追加到 evolution.py
@@ -519,33 +849,26 @@ class EvolutionEngine:
             return []
 
         try:
-            # 读取最后 500 行
-            content = log_path.read_text(encoding="utf-8", errors="ignore")
-            lines = content.splitlines()[-500:]
+            lines = _tail_lines(log_path, ERROR_SCAN_TAIL_LINES)
         except Exception as e:
             logger.warning("读取日志失败: %s", e)
             return []
 
         # 收集 ERROR 和 WARNING
-        # 日志格式: 2026-02-20 17:27:54,940 [WARNING] lq.gateway: 配置一致性警告: ...
-        import re as _re
-        error_pattern = _re.compile(
-            r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d+ '
-            r'\[(ERROR|WARNING)\] ([\w.]+): (.+)'
-        )
         patterns: dict[str, dict] = {}
 
         for line in lines:
-            match = error_pattern.match(line)
+            match = _LOG_ERROR_RE.match(line)
             if match:
                 level, module, msg = match.groups()
                 # 提取关键部分（取冒号前的主信息）
-                key_msg = msg.split(':')[0][:60]
+                key_msg = msg.split(':', 1)[0][:60]
                 key = f"[{level}] {module}: {key_msg}"
 
-                if key not in patterns:
-                    patterns[key] = {"pattern": key, "count": 0, "sample": line[:200]}
-                patterns[key]["count"] += 1
+                entry = patterns.get(key)
+                if entry is None:
+                    entry = patterns[key] = {"pattern": key, "count": 0, "sample": line[:200]}
+                entry["count"] += 1
 
         result = sorted(patterns.values(), key=lambda x: x["count"], reverse=True)
         logger.info("扫描到 %d 种错误/警告模式", len(result))
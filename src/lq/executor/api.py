@@ -5,7 +5,10 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
+import random
+import sys
 import time
+from functools import lru_cache
 from typing import Any
 
 import re
@@ -24,10 +27,13 @@ _GLM_THINK_RE = re.compile(r"<\|TG\|>.*?<\|TC\|>", re.DOTALL)
 
 def _clean_output(text: str) -> str:
     """移除模型输出中的推理标签和残留片段"""
-    text = _THINK_RE.sub("", text)
-    text = _GLM_THINK_RE.sub("", text)
-    text = text.replace("</think>", "")
-    text = text.replace("<|TG|>", "").replace("<|TC|>", "")
+    # 绝大多数回复不含推理标签：先用子串判断，免去对整段回复跑 DOTALL 正则
+    if "think>" in text:
+        text = _THINK_RE.sub("", text)
+        text = text.replace("</think>", "")
+    if "<|T" in text:
+        text = _GLM_THINK_RE.sub("", text)
+        text = text.replace("<|TG|>", "").replace("<|TC|>", "")
     return text.strip()
 
 
@@ -44,6 +50,25 @@ RETRYABLE_STATUS = {429, 500, 502, 503, 529}
 MAX_RETRIES = 3
 BASE_DELAY = 1.0  # 秒
 
+# Anthropic 客户端连接池：SDK 默认 keep-alive 仅 5 秒，工具调用轮次之间常超过这个间隔，
+# 放宽到 60 秒以复用连接、免去重复 TCP/TLS 握手（未启用 http2：h2 不在依赖中）。
+API_HTTP_LIMITS = {"max_connections": 100, "max_keepalive_connections": 16, "keepalive_expiry": 60}
+
+
+def _anthropic_http_client() -> Any:
+    """按 API_HTTP_LIMITS 构造 Anthropic SDK 的 HTTP client；构造不了时返回 None（用 SDK 默认）。
+
+    SDK 没有公开导出 Limits，且底层 HTTP 库随版本不同（httpx / httpx2），Limits 必须与之
+    同源：从公开的 DefaultAsyncHttpxClient 的基类所在模块取 Limits 类型。
+    """
+    try:
+        base = anthropic.DefaultAsyncHttpxClient.__mro__[1]
+        limits = sys.modules[base.__module__.partition(".")[0]].Limits(**API_HTTP_LIMITS)
+        return anthropic.DefaultAsyncHttpxClient(limits=limits)
+    except Exception:
+        logger.debug("无法定制 Anthropic 连接池，使用 SDK 默认设置", exc_info=True)
+        return None
+
 # 每百万 token 价格（USD），input / output
 MODEL_PRICING: dict[str, tuple[float, float]] = {
     # Anthropic
@@ -71,14 +96,21 @@ MODEL_PRICING: dict[str, tuple[float, float]] = {
 }
 
 
-def _estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
-    """根据模型和 token 数估算费用（USD）"""
+@lru_cache(maxsize=32)
+def _model_prices(model: str) -> tuple[float, float] | None:
+    """解析模型单价：精确匹配优先，否则做一次子串模糊匹配；结果按模型名缓存。"""
     prices = MODEL_PRICING.get(model)
     if not prices:
         for key, val in MODEL_PRICING.items():
             if key in model or model in key:
                 prices = val
                 break
+    return prices
+
+
+def _estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    """根据模型和 token 数估算费用（USD）"""
+    prices = _model_prices(model)
     if not prices:
         return 0.0
     input_price, output_price = prices
@@ -87,58 +119,67 @@ def _estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
 
 # ─── 重试逻辑 ───
 
-async def _retry_api_call(fn, *args, **kwargs):
-    """Anthropic SDK 指数退避重试"""
+# 可重试异常（SDK 的超时异常 APITimeoutError 是 APIConnectionError 的子类，已包含在内）
+_ANTHROPIC_RETRYABLE = (
+    anthropic.RateLimitError, anthropic.InternalServerError, anthropic.APIConnectionError,
+)
+_OPENAI_RETRYABLE = (
+    openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError,
+)
+RETRY_AFTER_MAX = 60.0  # 秒，服务端 retry-after 提示的上限
+RETRY_JITTER = 0.25  # 秒
+
+
+def _retry_delay(exc: Exception, attempt: int) -> float:
+    """指数退避 + 随机抖动；服务端给出 retry-after（秒）时以其为下限。"""
+    delay = BASE_DELAY * (2 ** attempt)
+    response = getattr(exc, "response", None)
+    if response is not None:
+        try:
+            hint = float(response.headers.get("retry-after", 0))
+        except (TypeError, ValueError):
+            hint = 0.0  # HTTP-date 格式等无法解析的值忽略
+        delay = max(delay, min(hint, RETRY_AFTER_MAX))
+    return delay + random.uniform(0, RETRY_JITTER)
+
+
+async def _retry_call(fn, retryable: tuple[type[Exception], ...], *args, **kwargs):
     last_exc = None
     for attempt in range(MAX_RETRIES + 1):
         try:
             return await fn(*args, **kwargs)
-        except anthropic.RateLimitError as e:
-            last_exc = e
-            if attempt < MAX_RETRIES:
-                delay = BASE_DELAY * (2 ** attempt)
-                logger.warning("API 限流，%0.1fs 后重试 (%d/%d)", delay, attempt + 1, MAX_RETRIES)
-                await asyncio.sleep(delay)
-        except anthropic.InternalServerError as e:
+        except retryable as e:
             last_exc = e
             if attempt < MAX_RETRIES:
-                delay = BASE_DELAY * (2 ** attempt)
-                logger.warning("API 服务器错误，%0.1fs 后重试 (%d/%d)", delay, attempt + 1, MAX_RETRIES)
-                await asyncio.sleep(delay)
-        except anthropic.APIConnectionError as e:
-            last_exc = e
-            if attempt < MAX_RETRIES:
-                delay = BASE_DELAY * (2 ** attempt)
-                logger.warning("API 连接错误，%0.1fs 后重试 (%d/%d)", delay, attempt + 1, MAX_RETRIES)
+                delay = _retry_delay(e, attempt)
+                logger.warning(
+                    "API 调用失败 (%s)，%0.1fs 后重试 (%d/%d)",
+                    type(e).__name__, delay, attempt + 1, MAX_RETRIES,
+                )
                 await asyncio.sleep(delay)
     raise last_exc
 
 
+async def _retry_api_call(fn, *args, **kwargs):
+    """Anthropic SDK 指数退避重试"""
+    return await _retry_call(fn, _ANTHROPIC_RETRYABLE, *args, **kwargs)
+
+
 async def _retry_openai_call(fn, *args, **kwargs):
     """OpenAI SDK 指数退避重试"""
-    last_exc = None
-    for attempt in range(MAX_RETRIES + 1):
-        try:
-            return await fn(*args, **kwargs)
-        except openai.RateLimitError as e:
-            last_exc = e
-            if attempt < MAX_RETRIES:
-                delay = BASE_DELAY * (2 ** attempt)
-                logger.warning("API 限流，%0.1fs 后重试 (%d/%d)", delay, attempt + 1, MAX_RETRIES)
-                await asyncio.sleep(delay)
-        except openai.InternalServerError as e:
-            last_exc = e
-            if attempt < MAX_RETRIES:
-                delay = BASE_DELAY * (2 ** attempt)
-                logger.warning("API 服务器错误，%0.1fs 后重试 (%d/%d)", delay, attempt + 1, MAX_RETRIES)
-                await asyncio.sleep(delay)
-        except openai.APIConnectionError as e:
-            last_exc = e
-            if attempt < MAX_RETRIES:
-                delay = BASE_DELAY * (2 ** attempt)
-                logger.warning("API 连接错误，%0.1fs 后重试 (%d/%d)", delay, attempt + 1, MAX_RETRIES)
-                await asyncio.sleep(delay)
-    raise last_exc
+    return await _retry_call(fn, _OPENAI_RETRYABLE, *args, **kwargs)
+
+
+def _tool_result_blocks(tool_results: list[dict]) -> list[dict]:
+    """工具执行结果 → Anthropic user 消息的 content blocks（text / tool_result）"""
+    return [
+        {"type": "text", "text": r["text"]} if r.get("type") == "text" else {
+            "type": "tool_result",
+            "tool_use_id": r["tool_use_id"],
+            "content": r["content"],
+        }
+        for r in tool_results
+    ]
 
 
 # ─── Anthropic 执行器 ───
@@ -153,6 +194,7 @@ class DirectAPIExecutor:
             api_key=api_config.api_key,
             base_url=api_config.base_url,
             default_headers={"Authorization": ""},
+            http_client=_anthropic_http_client(),
         )
         self.stats: Any = None
         # 透传给 SDK 的 extra_body（供应商特有字段，如 thinking/reasoning_effort 等）
@@ -194,16 +236,29 @@ class DirectAPIExecutor:
     async def reply_with_history(
         self, system: str, messages: list[dict[str, str]], max_tokens: int = 4096,
     ) -> str:
-        resp = await _retry_api_call(
-            self.client.messages.create,
+        text = await self._stream_text(
+            "reply_with_history",
             model=self.model,
             max_tokens=max_tokens,
             system=system,
             messages=messages,
             **self._extra_kwargs(),
         )
-        self._record_usage(resp, "reply_with_history")
-        return _clean_output(_extract_text(resp.content))
+        return _clean_output(text)
+
+    async def _stream_text(self, call_type: str, **kwargs: Any) -> str:
+        """流式请求，结束后按最终消息记录用量并取文本。
+
+        与非流式调用一致，只返回第一个 text 块。
+        整段流读取作为一次调用参与重试（中途断流则整体重来）。
+        """
+        async def _run() -> Any:
+            async with self.client.messages.stream(**kwargs) as stream:
+                return await stream.get_final_message()
+
+        final = await _retry_api_call(_run)
+        self._record_usage(final, call_type)
+        return _extract_text(final.content)
 
     async def quick_judge(self, prompt: str) -> str:
         resp = await _retry_api_call(
@@ -220,7 +275,6 @@ class DirectAPIExecutor:
         self, system: str, messages: list[dict], tools: list[dict],
         max_tokens: int = 4096,
     ) -> ToolResponse:
-        msgs = list(messages)
         tool_calls: list[dict] = []
 
         resp = await _retry_api_call(
@@ -228,7 +282,7 @@ class DirectAPIExecutor:
             model=self.model,
             max_tokens=max_tokens,
             system=system,
-            messages=msgs,
+            messages=messages,
             tools=tools,
             **self._extra_kwargs(),
         )
@@ -257,32 +311,23 @@ class DirectAPIExecutor:
                               combined_text[:150])
             return ToolResponse(
                 text=combined_text, tool_calls=tool_calls,
-                tool_use_truncated=truncated, messages=msgs,
+                tool_use_truncated=truncated, messages=messages,
             )
 
         tool_calls.extend(pending_tools)
         return ToolResponse(
             text=combined_text, tool_calls=tool_calls,
-            pending=True, raw_response=resp, messages=msgs,
+            pending=True, raw_response=resp, messages=messages,
         )
 
     async def continue_after_tools(
         self, system: str, messages: list[dict], tools: list[dict],
         tool_results: list[dict], raw_response: Any, max_tokens: int = 4096,
     ) -> ToolResponse:
-        msgs = list(messages)
-        msgs.append({"role": "assistant", "content": raw_response.content})
-        content_blocks = []
-        for r in tool_results:
-            if r.get("type") == "text":
-                content_blocks.append({"type": "text", "text": r["text"]})
-            else:
-                content_blocks.append({
-                    "type": "tool_result",
-                    "tool_use_id": r["tool_use_id"],
-                    "content": r["content"],
-                })
-        msgs.append({"role": "user", "content": content_blocks})
+        msgs = messages + [
+            {"role": "assistant", "content": raw_response.content},
+            {"role": "user", "content": _tool_result_blocks(tool_results)},
+        ]
         return await self.reply_with_tools(system, msgs, tools, max_tokens)
 
 
@@ -759,8 +804,6 @@ class OpenAIExecutor:
         tool_results: list[dict], raw_response: Any, max_tokens: int,
     ) -> ToolResponse:
         """Responses API: 将 output items 转为 Anthropic 格式追加到历史"""
-        msgs = list(messages)
-
         # 将 Responses output → Anthropic assistant message
         assistant_content: list[dict] = []
         for item in raw_response.output:
@@ -780,20 +823,10 @@ class OpenAIExecutor:
                     "name": item.name,
                     "input": args,
                 })
-        msgs.append({"role": "assistant", "content": assistant_content})
-
-        # 工具结果 → Anthropic tool_result
-        content_blocks: list[dict] = []
-        for r in tool_results:
-            if r.get("type") == "text":
-                content_blocks.append({"type": "text", "text": r["text"]})
-            else:
-                content_blocks.append({
-                    "type": "tool_result",
-                    "tool_use_id": r["tool_use_id"],
-                    "content": r["content"],
-                })
-        msgs.append({"role": "user", "content": content_blocks})
+        msgs = messages + [
+            {"role": "assistant", "content": assistant_content},
+            {"role": "user", "content": _tool_result_blocks(tool_results)},
+        ]
 
         return await self.reply_with_tools(system, msgs, tools, max_tokens)
 
@@ -802,8 +835,6 @@ class OpenAIExecutor:
         tool_results: list[dict], raw_response: Any, max_tokens: int,
     ) -> ToolResponse:
         """Chat Completions: 将 message + tool results 转为 Anthropic 格式追加到历史"""
-        msgs = list(messages)
-
         # 将 Chat response → Anthropic assistant message
         prev = raw_response.choices[0].message
         assistant_content: list[dict] = []
@@ -821,20 +852,10 @@ class OpenAIExecutor:
                     "name": tc.function.name,
                     "input": args,
                 })
-        msgs.append({"role": "assistant", "content": assistant_content})
-
-        # 工具结果 → Anthropic tool_result
-        content_blocks: list[dict] = []
-        for r in tool_results:
-            if r.get("type") == "text":
-                content_blocks.append({"type": "text", "text": r["text"]})
-            else:
-                content_blocks.append({
-                    "type": "tool_result",
-                    "tool_use_id": r["tool_use_id"],
-                    "content": r["content"],
-                })
-        msgs.append({"role": "user", "content": content_blocks})
+        msgs = messages + [
+            {"role": "assistant", "content": assistant_content},
+            {"role": "user", "content": _tool_result_blocks(tool_results)},
+        ]
 
         return await self.reply_with_tools(system, msgs, tools, max_tokens)
 
@@ -2,17 +2,71 @@
 
 from __future__ import annotations
 
+import heapq
 import json
 import logging
+import os
 import re
+import sys
+import threading
 from dataclasses import dataclass, field, asdict
 from datetime import date, datetime, timedelta, timezone
 from pathlib import Path
+from typing import Any, Iterator
+
+try:  # 可选加速（speed extra）：orjson 直接读写 bytes，比标准库快数倍
+    import orjson as _orjson
+except ImportError:
+    _orjson = None
 
 logger = logging.getLogger(__name__)
 
 CST = timezone(timedelta(hours=8))
 
+# 关键词提取：英文标识符（≥3 字符）与连续中文片段
+_WORD_RE = re.compile(r"[a-zA-Z_]\w{2,}")
+_CJK_RE = re.compile(r"[\u4e00-\u9fff]+")
+
+# 倒序读取记录文件时每次回读的块大小
+_REVERSE_READ_CHUNK = 8192
+
+# 相似经验检索窗口（天）：倒排索引只覆盖最近这些天的记录
+QUERY_WINDOW_DAYS = 7
+
+# 内存倒排索引的 posting（关键词 → 记录）总数上限；超出后丢弃最旧的记录。
+# 构建时只填到上限的 3/4，留出余量，避免每条新记录都触发重建。
+_INDEX_MAX_POSTINGS = 100_000
+
+
+def _dumps_line(obj: Any) -> bytes:
+    """序列化为一行 JSONL（UTF-8 bytes，含换行）。"""
+    if _orjson is not None:
+        return _orjson.dumps(obj) + b"\n"
+    return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _loads(data: bytes | str) -> Any:
+    return _orjson.loads(data) if _orjson is not None else json.loads(data)
+
+
+def _iter_lines_reversed(path: Path) -> Iterator[bytes]:
+    """从文件末尾按块回读，倒序产出非空行（bytes），无需载入整个文件。"""
+    with open(path, "rb") as f:
+        pos = f.seek(0, os.SEEK_END)
+        remainder = b""
+        while pos > 0:
+            step = min(_REVERSE_READ_CHUNK, pos)
+            pos -= step
+            f.seek(pos)
+            lines = (f.read(step) + remainder).split(b"\n")
+            # 首段可能是被块边界截断的半行，留到下一轮拼接
+            remainder = lines[0]
+            for line in reversed(lines[1:]):
+                if line.strip():
+                    yield line
+        if remainder.strip():
+            yield remainder
+
 
 @dataclass
 class CCExperienceEntry:
@@ -46,63 +100,191 @@ class CCExperienceEntry:
 
 
 class CCExperienceStore:
-    """CC 执行经验存储"""
+    """CC 执行经验存储
+
+    每天一个 ``YYYY-MM-DD.jsonl`` 记录文件，旁边是同名的 ``.idx`` 倒排索引文件
+    （每行 ``{"offset": 记录字节偏移, "keywords": [...]}``）。检索相似经验时只按
+    关键词命中的偏移读取对应记录，不再解析全部历史。
+    """
 
     def __init__(self, workspace: Path) -> None:
         self.dir = workspace / "cc_experience"
         self.dir.mkdir(parents=True, exist_ok=True)
+        # keyword → [(记录文件, 字节偏移)]，首次检索时惰性加载；跨天后按新窗口重建
+        self._index: dict[str, list[tuple[Path, int]]] | None = None
+        self._index_start = ""
+        self._index_postings = 0
+        # query_similar 可能在工作线程中执行：索引构建、.idx 补建 / 追加与内存索引
+        # 更新都在这把锁内进行，record() 会等待进行中的构建完成
+        self._index_lock = threading.Lock()
+        # 累计统计（total / success / cost），每次 record 增量更新
+        self._stats_path = self.dir / "stats.json"
+        self._stats = self._load_stats()
 
     def _today_path(self) -> Path:
         today = datetime.now(CST).strftime("%Y-%m-%d")
         return self.dir / f"{today}.jsonl"
 
     def record(self, entry: CCExperienceEntry) -> None:
-        """追加一条执行记录"""
+        """追加一条执行记录（同时更新倒排索引）"""
         path = self._today_path()
-        try:
-            with open(path, "a", encoding="utf-8") as f:
-                f.write(json.dumps(entry.to_dict(), ensure_ascii=False) + "\n")
-            logger.info(
-                "CC 经验已记录: session=%s success=%s cost=$%.4f",
-                entry.session_id[:12], entry.success, entry.cost_usd,
-            )
-        except Exception:
-            logger.exception("CC 经验记录失败")
+        idx_path = path.with_suffix(".idx")
+        keywords = self._extract_keywords(entry.prompt)
+        with self._index_lock:
+            if not idx_path.exists() and path.exists():
+                # 升级前写下的当天记录还没有索引：先补建，否则追加后的 .idx 只含新记录
+                try:
+                    self._read_index_file(path)
+                except Exception:
+                    logger.warning("补建 CC 经验索引失败: %s", path.name, exc_info=True)
+            try:
+                line = _dumps_line(entry.to_dict())
+                with open(path, "ab") as f:
+                    offset = f.tell()
+                    f.write(line)
+                logger.info(
+                    "CC 经验已记录: session=%s success=%s cost=$%.4f",
+                    entry.session_id[:12], entry.success, entry.cost_usd,
+                )
+            except Exception:
+                logger.exception("CC 经验记录失败")
+                return
+            try:
+                with open(idx_path, "ab") as f:
+                    f.write(_dumps_line({"offset": offset, "keywords": sorted(keywords)}))
+                if self._index is not None:
+                    if self._index_postings + len(keywords) > _INDEX_MAX_POSTINGS:
+                        self._index = None  # 下次检索时重建，丢弃最旧的记录
+                    else:
+                        for kw in keywords:
+                            self._index.setdefault(kw, []).append((path, offset))
+                        self._index_postings += len(keywords)
+            except Exception:
+                logger.exception("CC 经验索引更新失败")
+        self._stats["total"] += 1
+        if entry.success:
+            self._stats["success"] += 1
+        self._stats["cost"] += entry.cost_usd
+        self._save_stats()
+
+    # ── 倒排索引 ──
+
+    def _window_start(self) -> str:
+        """检索窗口内最早的日期（YYYY-MM-DD，可直接与文件名比较）"""
+        start = datetime.now(CST) - timedelta(days=QUERY_WINDOW_DAYS - 1)
+        return start.strftime("%Y-%m-%d")
+
+    def _load_index(self) -> dict[str, list[tuple[Path, int]]]:
+        """加载检索窗口内各天的索引；缺失的索引文件从记录文件补建。"""
+        start = self._window_start()
+        with self._index_lock:
+            if self._index is None or self._index_start != start:
+                self._index = self._build_index(start)
+                self._index_start = start
+            return self._index
+
+    def _build_index(self, start: str) -> dict[str, list[tuple[Path, int]]]:
+        """从新到旧加载 start 及之后各天的索引，posting 数达到上限的 3/4 即停止。"""
+        index: dict[str, list[tuple[Path, int]]] = {}
+        budget = _INDEX_MAX_POSTINGS * 3 // 4
+        postings = 0
+        for path in sorted(self.dir.glob("*.jsonl"), reverse=True):
+            if path.stem < start:
+                continue
+            try:
+                items = self._read_index_file(path)
+            except Exception:
+                logger.warning("加载 CC 经验索引失败: %s", path.name, exc_info=True)
+                continue
+            for offset, keywords in reversed(items):
+                if postings + len(keywords) > budget:
+                    self._index_postings = postings
+                    return index
+                for kw in keywords:
+                    # intern：各天索引中重复出现的关键词共享同一字符串对象
+                    index.setdefault(sys.intern(kw), []).append((path, offset))
+                postings += len(keywords)
+        self._index_postings = postings
+        return index
+
+    def _read_index_file(self, path: Path) -> list[tuple[int, list[str]]]:
+        """读取一天的索引；索引文件不存在时扫描记录文件补建。"""
+        idx_path = path.with_suffix(".idx")
+        if idx_path.exists():
+            items: list[tuple[int, list[str]]] = []
+            with open(idx_path, "rb") as f:
+                for line in f:
+                    if line.strip():
+                        d = _loads(line)
+                        items.append((d["offset"], d["keywords"]))
+            return items
+
+        items = []
+        offset = 0
+        with open(path, "rb") as f:
+            for raw in f:
+                if raw.strip():
+                    prompt = _loads(raw).get("prompt", "")
+                    items.append((offset, sorted(self._extract_keywords(prompt))))
+                offset += len(raw)
+        with open(idx_path, "wb") as f:
+            for off, keywords in items:
+                f.write(_dumps_line({"offset": off, "keywords": keywords}))
+        return items
+
+    @staticmethod
+    def _read_entry_at(path: Path, offset: int) -> CCExperienceEntry:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            return CCExperienceEntry.from_dict(_loads(f.readline()))
 
     def query_similar(self, prompt: str, limit: int = 3) -> list[CCExperienceEntry]:
-        """通过关键词匹配找到相似的历史执行"""
+        """通过关键词匹配找到相似的历史执行（最近 QUERY_WINDOW_DAYS 天）"""
         # 提取关键词（中文分词简化为字符 bigram + 英文单词）
         keywords = self._extract_keywords(prompt)
         if not keywords:
             return self.get_recent(limit)
 
-        scored: list[tuple[float, CCExperienceEntry]] = []
-        for path in sorted(self.dir.glob("*.jsonl"), reverse=True):
+        # 合并各关键词的倒排列表，统计每条记录命中的关键词数
+        index = self._load_index()
+        start = self._window_start()
+        overlaps: dict[tuple[Path, int], int] = {}
+        for kw in keywords:
+            for loc in index.get(kw, ()):
+                overlaps[loc] = overlaps.get(loc, 0) + 1
+
+        # 排序规则：命中数降序 → 新的日期优先 → 同文件内按记录先后。
+        # 只需前 limit 条：O(N) 建小顶堆后按需弹出，不对全部候选排序；
+        # 个别记录读取失败时继续弹出下一条补位。
+        day_rank = {
+            stem: i
+            for i, stem in enumerate(sorted({loc[0].stem for loc in overlaps}, reverse=True))
+        }
+        heap = [
+            (-hits, day_rank[path.stem], offset, path)
+            for (path, offset), hits in overlaps.items()
+            if path.stem >= start
+        ]
+        heapq.heapify(heap)
+
+        results: list[CCExperienceEntry] = []
+        while heap:
+            _, _, offset, path = heapq.heappop(heap)
             try:
-                for line in path.read_text(encoding="utf-8").strip().splitlines():
-                    entry = CCExperienceEntry.from_dict(json.loads(line))
-                    entry_keywords = self._extract_keywords(entry.prompt)
-                    overlap = len(keywords & entry_keywords)
-                    if overlap > 0:
-                        score = overlap / max(len(keywords), 1)
-                        scored.append((score, entry))
+                results.append(self._read_entry_at(path, offset))
             except Exception:
                 continue
-            # 搜索最近 7 天即可
-            if len(scored) > limit * 10:
+            if len(results) >= limit:
                 break
-
-        scored.sort(key=lambda x: x[0], reverse=True)
-        return [entry for _, entry in scored[:limit]]
+        return results
 
     def get_recent(self, limit: int = 5) -> list[CCExperienceEntry]:
         """获取最近的执行记录"""
         results: list[CCExperienceEntry] = []
         for path in sorted(self.dir.glob("*.jsonl"), reverse=True):
             try:
-                lines = path.read_text(encoding="utf-8").strip().splitlines()
-                for line in reversed(lines):
-                    results.append(CCExperienceEntry.from_dict(json.loads(line)))
+                for line in _iter_lines_reversed(path):
+                    results.append(CCExperienceEntry.from_dict(_loads(line)))
                     if len(results) >= limit:
                         return results
             except Exception:
@@ -111,19 +293,9 @@ class CCExperienceStore:
 
     def get_stats(self) -> dict:
         """总执行数、成功率、平均成本"""
-        total = 0
-        success_count = 0
-        total_cost = 0.0
-        for path in self.dir.glob("*.jsonl"):
-            try:
-                for line in path.read_text(encoding="utf-8").strip().splitlines():
-                    entry = json.loads(line)
-                    total += 1
-                    if entry.get("success"):
-                        success_count += 1
-                    total_cost += entry.get("cost_usd", 0.0)
-            except Exception:
-                continue
+        total = self._stats["total"]
+        success_count = self._stats["success"]
+        total_cost = self._stats["cost"]
         return {
             "total_executions": total,
             "success_rate": round(success_count / total, 2) if total > 0 else 0,
@@ -131,13 +303,61 @@ class CCExperienceStore:
             "avg_cost_usd": round(total_cost / total, 4) if total > 0 else 0,
         }
 
+    # ── 累计统计 ──
+
+    def _load_stats(self) -> dict:
+        """读取累计统计；文件缺失或损坏时从全部记录重建。"""
+        try:
+            data = _loads(self._stats_path.read_bytes())
+            return {
+                "total": int(data["total"]),
+                "success": int(data["success"]),
+                "cost": float(data["cost"]),
+            }
+        except FileNotFoundError:
+            pass
+        except Exception:
+            logger.warning("CC 经验统计文件损坏，重建")
+        return self.rebuild_stats()
+
+    def _save_stats(self) -> None:
+        """原子写入累计统计（先写临时文件再 os.replace）。"""
+        tmp = self._stats_path.with_suffix(".json.tmp")
+        try:
+            tmp.write_text(json.dumps(self._stats), encoding="utf-8")
+            os.replace(tmp, self._stats_path)
+        except Exception:
+            logger.warning("CC 经验统计保存失败", exc_info=True)
+
+    def rebuild_stats(self) -> dict:
+        """扫描全部记录文件重建累计统计（崩溃恢复 / 首次升级时使用）。"""
+        stats = {"total": 0, "success": 0, "cost": 0.0}
+        for path in self.dir.glob("*.jsonl"):
+            try:
+                with open(path, "rb") as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        entry = _loads(line)
+                        stats["total"] += 1
+                        if entry.get("success"):
+                            stats["success"] += 1
+                        stats["cost"] += entry.get("cost_usd", 0.0)
+            except Exception:
+                continue
+        self._stats = stats
+        self._save_stats()
+        return stats
+
     @staticmethod
-    def _extract_keywords(text: str) -> set[str]:
-        """提取关键词：英文单词 + 中文字符 bigram"""
-        words = set(re.findall(r"[a-zA-Z_]\w{2,}", text.lower()))
+    def _extract_keywords(text: str) -> frozenset[str]:
+        """提取关键词：英文单词 + 中文字符 bigram
+
+        记录写入时即计算并存入 ``.idx`` 索引，检索时每条记录只需读出关键词，
+        不再重复跑正则。
+        """
+        words = set(_WORD_RE.findall(text.lower()))
         # 中文 bigram
-        chinese = re.findall(r"[\u4e00-\u9fff]+", text)
-        for seg in chinese:
-            for i in range(len(seg) - 1):
-                words.add(seg[i : i + 2])
-        return words
+        for seg in _CJK_RE.findall(text):
+            words.update(seg[i : i + 2] for i in range(len(seg) - 1))
+        return frozenset(words)
@@ -3,20 +3,44 @@
 from __future__ import annotations
 
 import asyncio
+import dataclasses
 import logging
 import os
 import re
+import secrets
 import tempfile
 import time
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any
+from typing import Any, AsyncIterator, Awaitable, Callable
 
 from lq.config import APIConfig
 from lq.executor.cc_experience import CCExperienceEntry, CCExperienceStore
 from lq.memory import MemoryManager
 from lq.platform import PlatformAdapter, OutgoingMessage
 
+try:
+    from claude_agent_sdk import (
+        ClaudeSDKClient,
+        ClaudeAgentOptions,
+        AssistantMessage,
+        ResultMessage,
+        TextBlock,
+        ToolUseBlock,
+        ToolResultBlock,
+        ThinkingBlock,
+        PermissionResultAllow,
+        PermissionResultDeny,
+    )
+    _SDK_AVAILABLE = True
+except ImportError:
+    _SDK_AVAILABLE = False
+
+try:  # 可选加速（speed extra 的 pyahocorasick）：自动机一次扫描所有危险命令片段
+    import ahocorasick as _ahocorasick
+except ImportError:
+    _ahocorasick = None
+
 logger = logging.getLogger(__name__)
 
 # ── 安全分类常量 ──
@@ -29,9 +53,45 @@ _SAFE_TOOLS = frozenset({
 _DANGEROUS_BASH_PATTERNS = (
     "git push", "rm -rf", "chmod", "sudo", "mkfs", "dd if=",
     "shutdown", "reboot", "halt", "poweroff",
-    "> /dev/", "curl.*|.*sh", "wget.*|.*sh",
+    "> /dev/",
+)
+
+# 「下载后管道给 shell 执行」需要通配，不能用字面片段表达
+_PIPE_TO_SHELL = r"(?:curl|wget)\b.*\|.*sh"
+_PIPE_TO_SHELL_RE = re.compile(_PIPE_TO_SHELL, re.IGNORECASE)
+
+# 字面片段 + 管道模式合成一个正则，一次扫描完成匹配
+_DANGEROUS_BASH_RE = re.compile(
+    "|".join([*map(re.escape, _DANGEROUS_BASH_PATTERNS), _PIPE_TO_SHELL]),
+    re.IGNORECASE,
 )
 
+
+def _build_dangerous_automaton() -> Any:
+    """pyahocorasick（可选依赖）可用时，为字面片段构建 Aho-Corasick 自动机。
+
+    自动机对命令只扫描一遍，耗时与片段数量无关；正则交替则在每个位置逐一尝试各分支。
+    """
+    if _ahocorasick is None:
+        return None
+    automaton = _ahocorasick.Automaton()
+    for pattern in _DANGEROUS_BASH_PATTERNS:
+        automaton.add_word(pattern.lower(), pattern)
+    automaton.make_automaton()
+    return automaton
+
+
+_DANGEROUS_BASH_AC = _build_dangerous_automaton()
+
+
+def _is_dangerous_bash(command: str) -> bool:
+    """Bash 命令是否命中高危模式（大小写不敏感）"""
+    if _DANGEROUS_BASH_AC is None:
+        return _DANGEROUS_BASH_RE.search(command) is not None
+    if next(_DANGEROUS_BASH_AC.iter(command.lower()), None) is not None:
+        return True
+    return _PIPE_TO_SHELL_RE.search(command) is not None
+
 _MAX_TEXT_OUTPUT = 2000  # 文本输出截断长度
 
 
@@ -40,6 +100,12 @@ _MAX_TEXT_OUTPUT = 2000  # 文本输出截断长度
 class CCExecutionTrace:
     """收集一次 CC 执行的全部事件"""
 
+    __slots__ = (
+        "text_outputs", "tool_calls", "tool_results", "thinking_blocks", "errors",
+        "approvals", "tools_used", "files_modified", "start_time", "_start_mono",
+        "_summary_cache",
+    )
+
     def __init__(self) -> None:
         self.text_outputs: list[str] = []
         self.tool_calls: list[dict] = []
@@ -47,15 +113,21 @@ class CCExecutionTrace:
         self.thinking_blocks: list[str] = []
         self.errors: list[str] = []
         self.approvals: list[dict] = []
-        self.tools_used: set[str] = set()
-        self.files_modified: set[str] = set()
+        # 插入有序的去重集合（值恒为 None），保留首次调用顺序
+        self.tools_used: dict[str, None] = {}
+        self.files_modified: dict[str, None] = {}
+        # start_time 是墙钟时间（写入经验记录的时间戳）；耗时用单调时钟计算，
+        # 不受 NTP 校时等系统时间回拨影响
         self.start_time: float = time.time()
+        self._start_mono: float = time.monotonic()
+        # (工具数, 文件数, 错误数, 审批数, 摘要)：各集合只增不减，长度即版本号
+        self._summary_cache: tuple[int, int, int, int, str] | None = None
 
     def add_text(self, text: str) -> None:
         self.text_outputs.append(text)
 
     def add_tool_use(self, name: str, input_data: dict) -> None:
-        self.tools_used.add(name)
+        self.tools_used[name] = None
         self.tool_calls.append({
             "name": name,
             "input_summary": _summarize_input(name, input_data),
@@ -64,7 +136,7 @@ class CCExecutionTrace:
         if name in ("Write", "Edit", "NotebookEdit"):
             path = input_data.get("file_path", "") or input_data.get("notebook_path", "")
             if path:
-                self.files_modified.add(path)
+                self.files_modified[path] = None
 
     def add_tool_result(self, tool_use_id: str, content: Any) -> None:
         summary = str(content)[:200] if content else ""
@@ -79,27 +151,40 @@ class CCExecutionTrace:
         })
 
     def build_summary(self) -> str:
-        """生成执行过程的浓缩叙述"""
+        """生成执行过程的浓缩叙述（事件未变化时直接返回上次的结果）"""
+        key = (
+            len(self.tools_used), len(self.files_modified),
+            len(self.errors), len(self.approvals),
+        )
+        cache = self._summary_cache
+        if cache is not None and cache[:4] == key:
+            return cache[4]
+
         parts: list[str] = []
-        if self.tool_calls:
-            tool_names = [tc["name"] for tc in self.tool_calls]
-            parts.append(f"使用工具: {', '.join(dict.fromkeys(tool_names))}")
+        if self.tools_used:
+            parts.append(f"使用工具: {', '.join(self.tools_used)}")
         if self.files_modified:
-            parts.append(f"修改文件: {', '.join(sorted(self.files_modified))}")
+            parts.append(f"修改文件: {', '.join(self.files_modified)}")
         if self.errors:
             parts.append(f"错误: {'; '.join(self.errors[:3])}")
         if self.approvals:
-            approved = sum(1 for a in self.approvals if a["decision"] == "allow")
-            denied = sum(1 for a in self.approvals if a["decision"] == "deny")
+            approved = denied = 0
+            for a in self.approvals:
+                if a["decision"] == "allow":
+                    approved += 1
+                elif a["decision"] == "deny":
+                    denied += 1
             parts.append(f"审批: {approved}通过, {denied}拒绝")
-        return " | ".join(parts) if parts else "无操作"
+        text = " | ".join(parts) if parts else "无操作"
+        self._summary_cache = (*key, text)
+        return text
 
     @property
     def duration_ms(self) -> int:
-        return int((time.time() - self.start_time) * 1000)
+        return int((time.monotonic() - self._start_mono) * 1000)
 
 
-@dataclass
+@dataclass(slots=True)
 class CCExecutionResult:
     """CC 执行结果"""
     success: bool = False
@@ -134,32 +219,43 @@ class CCExecutionResult:
 # ── 进度报告器 ──
 
 class _ProgressReporter:
-    """累积工具调用，批量报告到 adapter（避免消息洪水）"""
+    """累积工具调用，批量报告到 adapter（避免消息洪水）。
+
+    report_* 只把行放进队列、不等待网络；由 ``run()`` 后台任务攒批发送，
+    SDK 事件消费不会被 adapter 的发送延迟拖住。
+    """
 
     BATCH_SIZE = 3
-    FLUSH_INTERVAL = 10.0  # 秒
+    FLUSH_INTERVAL = 10.0  # 秒，首条待发行最多等待这么久
+
+    _FLUSH = object()  # 队列标记：立即发送已累积的行
+
+    __slots__ = ("_adapter", "_chat_id", "_queue", "_task")
 
     def __init__(self, adapter: PlatformAdapter, chat_id: str) -> None:
         self._adapter = adapter
         self._chat_id = chat_id
-        self._pending: list[str] = []
-        self._last_flush: float = time.time()
+        self._queue: asyncio.Queue[Any] = asyncio.Queue()
+        self._task: asyncio.Task | None = None
 
-    async def report_tool_use(self, name: str, input_summary: str) -> None:
+    def start(self) -> None:
+        """启动后台发送任务（需在事件循环中调用）"""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    def report_tool_use(self, name: str, input_summary: str) -> None:
         icon = "🔍" if name in _SAFE_TOOLS else "🔧"
-        self._pending.append(f"{icon} {name}: {input_summary}")
-        if len(self._pending) >= self.BATCH_SIZE or self._should_flush():
-            await self.flush()
+        self._queue.put_nowait(f"{icon} {name}: {input_summary}")
 
-    async def report_approval(self, tool: str, decision: str, by: str) -> None:
+    def report_approval(self, tool: str, decision: str, by: str) -> None:
         icon = "✓" if decision == "allow" else "✗"
         label = "LLM" if by == "llm" else "人工"
         line = f"{icon} {label}审批 {tool}: {'允许' if decision == 'allow' else '拒绝'}"
-        self._pending.append(line)
-        await self.flush()
+        self._queue.put_nowait(line)
+        self._queue.put_nowait(self._FLUSH)
 
     async def report_completion(self, result: CCExecutionResult) -> None:
-        await self.flush()  # 先发送累积的
+        await self.close()  # 先发送累积的
         status = "✅ 完成" if result.success else "❌ 失败"
         parts = [f"**CC {status}**"]
         if result.cost_usd > 0:
@@ -176,19 +272,394 @@ class _ProgressReporter:
         except Exception:
             logger.debug("完成报告发送失败", exc_info=True)
 
-    async def flush(self) -> None:
-        if not self._pending:
+    async def close(self) -> None:
+        """发送剩余的累积行并结束后台任务"""
+        if self._task is None:
             return
-        text = "**CC 进度**\n" + "\n".join(self._pending)
-        self._pending.clear()
-        self._last_flush = time.time()
+        self._queue.put_nowait(None)
+        await self._task
+        self._task = None
+
+    def cancel(self) -> None:
+        """放弃未发送的行并取消后台任务（执行被取消时调用）"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def run(self) -> None:
+        """后台循环：攒满 BATCH_SIZE 行、首行等待超过 FLUSH_INTERVAL 或收到标记时发送。"""
+        loop = asyncio.get_running_loop()
+        pending: list[str] = []
+        deadline = 0.0
+        while True:
+            if pending:
+                try:
+                    item = await asyncio.wait_for(
+                        self._queue.get(), timeout=max(deadline - loop.time(), 0),
+                    )
+                except asyncio.TimeoutError:
+                    item = self._FLUSH
+            else:
+                item = await self._queue.get()
+
+            if item is None:
+                await self._send(pending)
+                return
+            if item is self._FLUSH:
+                await self._send(pending)
+                continue
+            if not pending:
+                deadline = loop.time() + self.FLUSH_INTERVAL
+            pending.append(item)
+            if len(pending) >= self.BATCH_SIZE:
+                await self._send(pending)
+
+    async def _send(self, pending: list[str]) -> None:
+        if not pending:
+            return
+        text = "**CC 进度**\n" + "\n".join(pending)
+        pending.clear()
         try:
             await self._adapter.send(OutgoingMessage(self._chat_id, text))
         except Exception:
             logger.debug("进度报告发送失败", exc_info=True)
 
-    def _should_flush(self) -> bool:
-        return time.time() - self._last_flush > self.FLUSH_INTERVAL
+
+# ── 客户端复用 ──
+
+_STREAM_END = object()  # 输出队列标记：本轮 receive_response 结束
+
+
+class _PooledClient:
+    """在独立后台任务中持有一个已连接的 ClaudeSDKClient。
+
+    SDK 要求 connect → query → disconnect 在同一个 async 上下文中完成，
+    所以客户端的全部操作都放在 ``_run()`` 任务里：调用方通过 ``stream()``
+    投递 prompt 并逐条取回消息。权限回调经 ``handler`` 转发给当前这次执行。
+    """
+
+    def __init__(self, options: Any, cwd: str, max_budget_usd: float) -> None:
+        loop = asyncio.get_running_loop()
+        self.cwd = cwd
+        self.budget = max_budget_usd  # CLI 进程启动时的预算（进程内累计扣减）
+        self.session_id = ""
+        self.total_cost = 0.0  # CLI 进程内累计成本（ResultMessage.total_cost_usd）
+        self.created = loop.time()
+        self.last_used = self.created
+        self.handler: Any = None
+        self.client: Any = None
+        self._jobs: asyncio.Queue[Any] = asyncio.Queue()
+        self._connected: asyncio.Future[None] = loop.create_future()
+        options = dataclasses.replace(options, can_use_tool=self._dispatch_permission)
+        self._task = asyncio.create_task(self._run(options))
+
+    @property
+    def alive(self) -> bool:
+        return self.client is not None and not self._task.done()
+
+    async def connect(self) -> None:
+        """等待后台任务完成连接（连接失败时抛出原异常）"""
+        await self._connected
+
+    async def stream(self, prompt: str) -> AsyncIterator[Any]:
+        """发送一轮 query，逐条产出直到 ResultMessage 的消息"""
+        if not self.alive:
+            raise RuntimeError("CC 客户端已断开")
+        out: asyncio.Queue[Any] = asyncio.Queue()
+        self._jobs.put_nowait((prompt, out))
+        while (item := await out.get()) is not _STREAM_END:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    async def close(self) -> None:
+        """断开客户端（在后台任务内完成 disconnect）"""
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def _dispatch_permission(
+        self, tool_name: str, tool_input: dict[str, Any], context: Any,
+    ) -> Any:
+        handler = self.handler
+        if handler is None:
+            # 已归还到池中、没有执行在等结果时迟到的权限请求：一律拒绝
+            logger.info("CC 空闲会话的迟到权限请求已拒绝: %s", tool_name)
+            return PermissionResultDeny(message="当前没有进行中的任务，拒绝此操作")
+        return await handler(tool_name, tool_input, context)
+
+    async def _run(self, options: Any) -> None:
+        try:
+            async with ClaudeSDKClient(options=options) as client:
+                self.client = client
+                self._connected.set_result(None)
+                while (job := await self._jobs.get()) is not None:
+                    prompt, out = job
+                    try:
+                        await client.query(prompt)
+                        async for message in client.receive_response():
+                            out.put_nowait(message)
+                    except Exception as e:
+                        out.put_nowait(e)
+                        break  # 连接状态未知，不再复用
+                    finally:
+                        out.put_nowait(_STREAM_END)
+        except Exception as e:
+            if not self._connected.done():
+                self._connected.set_exception(e)
+            else:
+                logger.debug("CC 客户端后台任务异常退出", exc_info=True)
+        finally:
+            self.client = None
+            if not self._connected.done():
+                self._connected.set_exception(RuntimeError("CC 客户端连接被中断"))
+            # 已投递但没来得及处理的 query 直接结束，避免调用方永远等待
+            while not self._jobs.empty():
+                job = self._jobs.get_nowait()
+                if job is not None:
+                    job[1].put_nowait(RuntimeError("CC 客户端已断开"))
+                    job[1].put_nowait(_STREAM_END)
+
+
+class _ClientPool:
+    """执行结束后按 chat 保留 CC 客户端，供后续任务复用（免去 CLI 子进程启动与握手）。
+
+    仅当「同一 chat、续接同一 session、同一工作目录」时复用——活着的 CLI 进程里
+    就是这个会话，效果等同 resume。CLI 的预算在进程内累计扣减，剩余预算不足本次
+    请求的 MIN_BUDGET_RATIO 时不复用（复用时实际预算只会比请求的更紧）。
+    """
+
+    IDLE_TIMEOUT = 300.0  # 秒，空闲超过即断开
+    MAX_LIFETIME = 1800.0  # 秒，进程存活上限
+    MAX_IDLE = 4  # 最多保留的空闲客户端数
+    MIN_BUDGET_RATIO = 0.5
+
+    def __init__(self) -> None:
+        self._idle: dict[str, _PooledClient] = {}  # chat_id → 空闲客户端
+        self._reapers: dict[str, asyncio.TimerHandle] = {}
+        self._closing: set[asyncio.Task] = set()
+
+    def checkout(
+        self, chat_id: str, session_id: str | None, cwd: str, max_budget_usd: float,
+    ) -> _PooledClient | None:
+        """取出可续接 session_id 的空闲客户端；不满足复用条件时返回 None。"""
+        entry = self._idle.pop(chat_id, None)
+        handle = self._reapers.pop(chat_id, None)
+        if handle:
+            handle.cancel()
+        if entry is None:
+            return None
+        now = asyncio.get_running_loop().time()
+        if (
+            session_id
+            and entry.session_id == session_id
+            and entry.cwd == cwd
+            and entry.alive
+            and now - entry.created < self.MAX_LIFETIME
+            and entry.budget - entry.total_cost >= max_budget_usd * self.MIN_BUDGET_RATIO
+        ):
+            return entry
+        self._close_later(entry)
+        return None
+
+    def checkin(self, chat_id: str, entry: _PooledClient) -> None:
+        """归还执行完毕的客户端，空闲 IDLE_TIMEOUT 后自动断开。"""
+        loop = asyncio.get_running_loop()
+        entry.handler = None
+        entry.last_used = loop.time()
+        if not entry.alive or entry.last_used - entry.created >= self.MAX_LIFETIME:
+            self._close_later(entry)
+            return
+        old = self._idle.pop(chat_id, None)
+        if old is not None:
+            self._expire(chat_id, old)
+            self._close_later(old)
+        while len(self._idle) >= self.MAX_IDLE:
+            oldest = min(self._idle, key=lambda k: self._idle[k].last_used)
+            self._expire(oldest, self._idle[oldest])
+        self._idle[chat_id] = entry
+        self._reapers[chat_id] = loop.call_later(
+            self.IDLE_TIMEOUT, self._expire, chat_id, entry,
+        )
+
+    async def aclose(self) -> None:
+        """断开全部空闲客户端（gateway 关闭时调用）"""
+        for chat_id, entry in list(self._idle.items()):
+            self._expire(chat_id, entry)
+        if self._closing:
+            await asyncio.gather(*self._closing, return_exceptions=True)
+
+    def _expire(self, chat_id: str, entry: _PooledClient) -> None:
+        if self._idle.get(chat_id) is entry:
+            del self._idle[chat_id]
+            self._close_later(entry)
+        handle = self._reapers.pop(chat_id, None)
+        if handle:
+            handle.cancel()
+
+    def _close_later(self, entry: _PooledClient) -> None:
+        task = asyncio.create_task(entry.close())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+
+# ── LLM 审批合批 ──
+
+# 合批回复中的一行：「序号. 结论」
+_VERDICT_LINE_RE = re.compile(r"^\s*(\d+)\s*[.)）、:：]?\s*(ALLOW|DENY|UNCERTAIN)", re.M)
+
+
+class _ApprovalBatcher:
+    """把短时间内涌入的 normal 级审批合成一次 LLM 调用。
+
+    每次 CC 执行单独一个实例：一批里只有同一任务的请求，别的会话的任务文本
+    不会影响本任务的审批结论。
+    ``submit()`` 把请求放进队列并等待自己的 future；后台 ``run()`` 取到首个
+    请求后最多再等 MAX_WAIT 秒、攒够 MAX_BATCH 条即发出，一次问完再按序号把
+    结论分发回各 future。只有一条时仍用单问 prompt，行为与逐条审批一致。
+    """
+
+    MAX_BATCH = 5
+    MAX_WAIT = 0.15  # 秒，首条请求最多等待这么久凑批
+
+    __slots__ = ("_reply", "_queue", "_task", "_collecting", "_inflight")
+
+    def __init__(self, reply: Callable[[str, int], Awaitable[str]]) -> None:
+        self._reply = reply  # (prompt, max_tokens) → LLM 回复文本
+        self._queue: asyncio.Queue[tuple[str, str, str, asyncio.Future[str]]] = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+        # 已出队、正在凑批尚未交给 _decide 的请求
+        self._collecting: list[tuple[str, str, str, asyncio.Future[str]]] = []
+        self._inflight: set[asyncio.Task] = set()
+
+    async def submit(self, tool_name: str, input_summary: str, original_prompt: str) -> str:
+        """提交一条审批请求，返回 allow / deny"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+        future: asyncio.Future[str] = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((tool_name, input_summary, original_prompt, future))
+        return await future
+
+    async def aclose(self) -> None:
+        """停止后台任务；所有未决请求（排队中、凑批中、判定中）一律拒绝"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for task in self._inflight:
+            task.cancel()
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        pending = self._collecting
+        self._collecting = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        _deny_unresolved(pending)
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = self._collecting = [await self._queue.get()]
+            deadline = loop.time() + self.MAX_WAIT
+            while len(batch) < self.MAX_BATCH:
+                try:
+                    batch.append(await asyncio.wait_for(
+                        self._queue.get(), timeout=max(deadline - loop.time(), 0),
+                    ))
+                except asyncio.TimeoutError:
+                    break
+            # 判定放到独立任务，LLM 调用期间继续攒下一批
+            self._collecting = []
+            task = asyncio.create_task(self._decide(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _decide(self, batch: list[tuple[str, str, str, asyncio.Future[str]]]) -> None:
+        try:
+            await self._decide_batch(batch)
+        finally:
+            # 被 aclose 取消时，尚未得出结论的请求拒绝，避免权限回调永远挂起
+            _deny_unresolved(batch)
+
+    async def _decide_batch(self, batch: list[tuple[str, str, str, asyncio.Future[str]]]) -> None:
+        decisions: dict[int, str] = {}
+        if len(batch) == 1:
+            decisions[1] = await self._ask_one(*batch[0][:3])
+        else:
+            try:
+                # 每行「序号. UNCERTAIN」约 5 token，留足余量以免回复被截断
+                response = await self._reply(_batch_approval_prompt(batch), 32 * len(batch))
+                for m in _VERDICT_LINE_RE.finditer(response.upper()):
+                    i = int(m.group(1))
+                    if 1 <= i <= len(batch):
+                        tool_name, input_summary = batch[i - 1][:2]
+                        decisions[i] = _to_decision(m.group(2), tool_name, input_summary)
+            except Exception:
+                logger.debug("LLM 合批审批调用失败，逐条重问", exc_info=True)
+            # 回复缺漏、错号或被截断的条目不能默认放行：用单问 prompt 逐条重问
+            missing = [i for i in range(1, len(batch) + 1) if i not in decisions]
+            if missing:
+                answers = await asyncio.gather(
+                    *(self._ask_one(*batch[i - 1][:3]) for i in missing),
+                )
+                decisions.update(zip(missing, answers))
+
+        for i, (_, _, _, future) in enumerate(batch, 1):
+            if not future.done():
+                future.set_result(decisions[i])
+
+    async def _ask_one(self, tool_name: str, input_summary: str, original_prompt: str) -> str:
+        """单条审批，行为与合批前的逐条审批一致（调用失败降级放行）"""
+        try:
+            response = await self._reply(
+                _single_approval_prompt(tool_name, input_summary, original_prompt), 32,
+            )
+        except Exception:
+            logger.debug("LLM 审批调用失败，降级放行", exc_info=True)
+            return "allow"
+        return _to_decision(response.strip().upper(), tool_name, input_summary)
+
+
+def _deny_unresolved(batch: list[tuple[str, str, str, asyncio.Future[str]]]) -> None:
+    for *_, future in batch:
+        if not future.done():
+            future.set_result("deny")
+
+
+def _to_decision(verdict: str, tool_name: str, input_summary: str) -> str:
+    """LLM 结论（已大写）→ allow / deny"""
+    if "DENY" in verdict:
+        return "deny"
+    if "UNCERTAIN" in verdict:
+        # 拿不准 → 放行但记录
+        logger.info("LLM 审批不确定: %s(%s)", tool_name, input_summary)
+    return "allow"
+
+
+def _single_approval_prompt(tool_name: str, input_summary: str, original_prompt: str) -> str:
+    return (
+        f"用户的原始任务: {original_prompt[:500]}\n\n"
+        f"Claude Code 想要执行: {tool_name}({input_summary})\n\n"
+        "这个操作是否合理且安全？回答 ALLOW 或 DENY 或 UNCERTAIN（拿不准）。"
+        "只回答一个词。"
+    )
+
+
+def _batch_approval_prompt(batch: list[tuple[str, str, str, asyncio.Future[str]]]) -> str:
+    # 同一批只来自同一次执行，共用一个原始任务
+    parts = [
+        f"用户的原始任务: {batch[0][2][:500]}\n",
+        "Claude Code 想要执行以下操作，逐条判断是否合理且安全。\n",
+    ]
+    for i, (tool_name, input_summary, _, _) in enumerate(batch, 1):
+        parts.append(f"{i}. {tool_name}({input_summary})")
+    parts.append(
+        "\n每条一行，格式「序号. 结论」，结论为 ALLOW 或 DENY 或 UNCERTAIN（拿不准），"
+        "不要输出其他内容。"
+    )
+    return "\n".join(parts)
 
 
 # ── 主类 ──
@@ -215,6 +686,10 @@ class ClaudeCodeSession:
         self._active_clients: dict[str, Any] = {}  # chat_id → ClaudeSDKClient
         # 审批等待队列
         self._pending_approvals: dict[str, asyncio.Future] = {}
+        # 可续接会话的空闲客户端
+        self._pool = _ClientPool()
+        # 执行结束后的后台收尾任务（经验记录），持有引用防止被回收
+        self._background: set[asyncio.Task] = set()
 
     async def execute(
         self,
@@ -228,22 +703,10 @@ class ClaudeCodeSession:
     ) -> CCExecutionResult:
         """执行 CC 任务，带流式事件处理和分层审批"""
         # 构建干净的子进程环境（移除 CLAUDECODE 防止嵌套误判）
-        clean_env: dict[str, str] = {
-            k: v for k, v in os.environ.items() if k != "CLAUDECODE"
-        }
+        clean_env: dict[str, str] = dict(os.environ)
+        clean_env.pop("CLAUDECODE", None)
 
-        try:
-            from claude_agent_sdk import (
-                ClaudeSDKClient,
-                ClaudeAgentOptions,
-                AssistantMessage,
-                ResultMessage,
-                TextBlock,
-                ToolUseBlock,
-                ToolResultBlock,
-                ThinkingBlock,
-            )
-        except ImportError:
+        if not _SDK_AVAILABLE:
             return CCExecutionResult(
                 error="claude-agent-sdk 未安装，请运行: uv sync",
             )
@@ -251,37 +714,44 @@ class ClaudeCodeSession:
         trace = CCExecutionTrace()
         reporter = _ProgressReporter(self.adapter, chat_id)
         cwd = working_dir or str(self.workspace)
+        workspace_resolved = Path(cwd).resolve()
 
         # 构建记忆上下文 —— 写临时文件而非塞 system_prompt，绕开 argv 128 KiB 限制
-        memory_context = self._build_memory_context(chat_id)
-        memory_path = self._write_memory_tempfile(memory_context)
+        # 读记忆文件 + 写临时文件、检索相似经验都是磁盘 I/O：放到线程里并发，不阻塞事件循环
+        memory_path, similar = await asyncio.gather(
+            asyncio.to_thread(self._prepare_memory_file, chat_id),
+            asyncio.to_thread(self.experience.query_similar, prompt, 3),
+        )
         enriched_prompt = self._build_enriched_prompt(
-            prompt, chat_id, context, memory_path=memory_path,
+            prompt, chat_id, context, memory_path=memory_path, similar=similar,
         )
 
+        # normal 级工具的 LLM 审批合批（仅限本次执行）
+        approvals = _ApprovalBatcher(self._ask_llm)
+
         # 创建权限回调
         async def permission_handler(
             tool_name: str,
             tool_input: dict[str, Any],
             _context: Any,
         ) -> Any:
-            from claude_agent_sdk import PermissionResultAllow, PermissionResultDeny
-            risk = self._classify_risk(tool_name, tool_input, cwd)
+            risk = self._classify_risk(tool_name, tool_input, workspace_resolved)
+            summary = _summarize_input(tool_name, tool_input)
             if risk == "safe":
-                trace.add_approval(tool_name, _summarize_input(tool_name, tool_input), "allow", "auto")
+                trace.add_approval(tool_name, summary, "allow", "auto")
                 return PermissionResultAllow()
             elif risk == "normal":
-                decision = await self._llm_approval(tool_name, tool_input, prompt)
-                trace.add_approval(tool_name, _summarize_input(tool_name, tool_input), decision, "llm")
-                await reporter.report_approval(tool_name, decision, "llm")
+                decision = await self._llm_approval(approvals, tool_name, summary, prompt)
+                trace.add_approval(tool_name, summary, decision, "llm")
+                reporter.report_approval(tool_name, decision, "llm")
                 if decision == "allow":
                     return PermissionResultAllow()
                 else:
                     return PermissionResultDeny(message="LLM 审批拒绝此操作")
             else:  # dangerous
-                decision = await self._human_approval(tool_name, tool_input, chat_id)
-                trace.add_approval(tool_name, _summarize_input(tool_name, tool_input), decision, "human")
-                await reporter.report_approval(tool_name, decision, "human")
+                decision = await self._human_approval(tool_name, summary, chat_id)
+                trace.add_approval(tool_name, summary, decision, "human")
+                reporter.report_approval(tool_name, decision, "human")
                 if decision == "allow":
                     return PermissionResultAllow()
                 else:
@@ -291,16 +761,23 @@ class ClaudeCodeSession:
         def _stderr_handler(line: str) -> None:
             logger.debug("CC stderr: %s", line.rstrip())
 
-        options = ClaudeAgentOptions(
-            system_prompt={"type": "preset", "preset": "claude_code"},
-            permission_mode="acceptEdits",
-            cwd=cwd,
-            max_budget_usd=max_budget_usd,
-            can_use_tool=permission_handler,
-            resume=session_id,
-            env=clean_env,
-            stderr=_stderr_handler,
-        )
+        # 续接同一会话时优先复用还活着的 CLI 进程，否则新建（权限回调由 pooled 转发）
+        pooled = self._pool.checkout(chat_id, session_id, cwd, max_budget_usd)
+        if pooled is None:
+            options = ClaudeAgentOptions(
+                system_prompt={"type": "preset", "preset": "claude_code"},
+                permission_mode="acceptEdits",
+                cwd=cwd,
+                max_budget_usd=max_budget_usd,
+                resume=session_id,
+                env=clean_env,
+                stderr=_stderr_handler,
+            )
+            pooled = _PooledClient(options, cwd, max_budget_usd)
+        else:
+            logger.info("复用 CC 会话进程: session=%s", (session_id or "")[:12])
+        pooled.handler = permission_handler
+        reusable = False
 
         # 设置 thinking emoji
         try:
@@ -309,46 +786,53 @@ class ClaudeCodeSession:
             pass
 
         result = CCExecutionResult()
+        reporter.start()
+        # thinking 块只用于调试排查，长推理可累积数 MB：非 DEBUG 级别不保留
+        capture_thinking = logger.isEnabledFor(logging.DEBUG)
 
         try:
-            async with ClaudeSDKClient(options=options) as client:
-                self._active_clients[chat_id] = client
-
-                await client.query(enriched_prompt)
-
-                # 用 wait_for 包裹一个消费协程（非 async generator）来实现超时
-                async def _consume_with_result() -> ResultMessage | None:
-                    async for message in client.receive_response():
-                        if isinstance(message, AssistantMessage):
-                            for block in message.content:
-                                if isinstance(block, TextBlock):
-                                    trace.add_text(block.text)
-                                elif isinstance(block, ToolUseBlock):
-                                    trace.add_tool_use(block.name, block.input)
-                                    await reporter.report_tool_use(
-                                        block.name,
-                                        _summarize_input(block.name, block.input),
-                                    )
-                                elif isinstance(block, ToolResultBlock):
-                                    trace.add_tool_result(block.tool_use_id, block.content)
-                                elif isinstance(block, ThinkingBlock):
-                                    trace.add_thinking(block.thinking)
-                        elif isinstance(message, ResultMessage):
+            await pooled.connect()
+            self._active_clients[chat_id] = pooled.client
+
+            # 用 wait_for 包裹一个消费协程（非 async generator）来实现超时
+            async def _consume_with_result() -> ResultMessage | None:
+                async for message in pooled.stream(enriched_prompt):
+                    match message:
+                        case AssistantMessage(content=blocks):
+                            for block in blocks:
+                                match block:
+                                    case TextBlock(text=text):
+                                        trace.add_text(text)
+                                    case ToolUseBlock(name=name, input=tool_input):
+                                        trace.add_tool_use(name, tool_input)
+                                        reporter.report_tool_use(
+                                            name, _summarize_input(name, tool_input),
+                                        )
+                                    case ToolResultBlock(tool_use_id=tool_use_id, content=content):
+                                        trace.add_tool_result(tool_use_id, content)
+                                    case ThinkingBlock(thinking=thinking) if capture_thinking:
+                                        trace.add_thinking(thinking)
+                        case ResultMessage():
                             return message
-                    return None
+                return None
 
-                result_msg = await asyncio.wait_for(
-                    _consume_with_result(), timeout=timeout,
-                )
-                if result_msg is not None:
-                    result.success = not result_msg.is_error
-                    result.session_id = result_msg.session_id
-                    result.cost_usd = result_msg.total_cost_usd or 0.0
-                    result.duration_ms = result_msg.duration_ms
-                    result.num_turns = result_msg.num_turns
-                    result.can_resume = True
-                    if result_msg.result:
-                        result.output = result_msg.result
+            result_msg = await asyncio.wait_for(
+                _consume_with_result(), timeout=timeout,
+            )
+            if result_msg is not None:
+                # total_cost_usd 是 CLI 进程内累计值，复用的进程要扣掉之前轮次
+                total_cost = result_msg.total_cost_usd or 0.0
+                result.success = not result_msg.is_error
+                result.session_id = result_msg.session_id
+                result.cost_usd = max(total_cost - pooled.total_cost, 0.0)
+                result.duration_ms = result_msg.duration_ms
+                result.num_turns = result_msg.num_turns
+                result.can_resume = True
+                if result_msg.result:
+                    result.output = result_msg.result
+                pooled.total_cost = total_cost
+                pooled.session_id = result_msg.session_id
+                reusable = True
 
         except asyncio.TimeoutError:
             result.error = f"CC 执行超时 ({timeout}s)"
@@ -364,8 +848,16 @@ class ClaudeCodeSession:
             result.error = str(e)
             trace.errors.append(str(e))
             logger.exception("CC 执行异常")
+        except asyncio.CancelledError:
+            reporter.cancel()
+            raise
         finally:
             self._active_clients.pop(chat_id, None)
+            if reusable:
+                self._pool.checkin(chat_id, pooled)
+            else:
+                await pooled.close()
+            await approvals.aclose()
             try:
                 await self.adapter.stop_thinking(chat_id)
             except Exception:
@@ -377,20 +869,28 @@ class ClaudeCodeSession:
                     logger.debug("清理记忆临时文件失败: %s", memory_path, exc_info=True)
 
         # 填充追踪信息
-        result.tools_used = sorted(trace.tools_used)
-        result.files_modified = sorted(trace.files_modified)
+        result.tools_used = list(trace.tools_used)
+        result.files_modified = list(trace.files_modified)
         result.trace_summary = trace.build_summary()
         if not result.output and trace.text_outputs:
-            result.output = "\n".join(trace.text_outputs)[-_MAX_TEXT_OUTPUT:]
+            result.output = _tail_join(trace.text_outputs, _MAX_TEXT_OUTPUT)
 
         # 发送完成报告
         await reporter.report_completion(result)
 
-        # 记录经验
-        await self._record_experience(trace, result, prompt, cwd)
+        # 记录经验：经验提炼要再调一次 LLM，放到后台，不拖慢 execute 返回
+        task = asyncio.create_task(self._record_experience(trace, result, prompt, cwd))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
 
         return result
 
+    async def aclose(self) -> None:
+        """等待后台经验记录完成并断开所有保留的 CC 客户端（gateway 关闭时调用）"""
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        await self._pool.aclose()
+
     async def interrupt(self, chat_id: str) -> None:
         """中途打断正在执行的 CC"""
         client = self._active_clients.get(chat_id)
@@ -409,22 +909,23 @@ class ClaudeCodeSession:
 
     # ── 分层审批 ──
 
-    def _classify_risk(self, tool_name: str, tool_input: dict, workspace_dir: str) -> str:
-        """分类工具调用风险: safe / normal / dangerous"""
+    def _classify_risk(self, tool_name: str, tool_input: dict, workspace: Path) -> str:
+        """分类工具调用风险: safe / normal / dangerous
+
+        workspace 为已 resolve 的工作目录（每次执行只解析一次）。
+        """
         if tool_name in _SAFE_TOOLS:
             return "safe"
 
         if tool_name == "Bash":
             command = tool_input.get("command", "")
-            cmd_lower = command.lower()
-            for pattern in _DANGEROUS_BASH_PATTERNS:
-                if pattern in cmd_lower:
-                    return "dangerous"
+            if _is_dangerous_bash(command):
+                return "dangerous"
             return "normal"
 
         if tool_name in ("Write", "Edit", "NotebookEdit"):
             path = tool_input.get("file_path", "") or tool_input.get("notebook_path", "")
-            if path and not self._is_within_workspace(path, workspace_dir):
+            if path and not self._is_within_workspace(path, workspace):
                 return "dangerous"
             return "normal"
 
@@ -432,51 +933,37 @@ class ClaudeCodeSession:
         return "normal"
 
     @staticmethod
-    def _is_within_workspace(path: str, workspace_dir: str) -> bool:
-        """检查路径是否在工作区内"""
+    def _is_within_workspace(path: str, workspace: Path) -> bool:
+        """检查路径是否在工作区内（workspace 需已 resolve；相对路径按工作区解析）"""
         try:
-            resolved = Path(path).resolve()
-            workspace = Path(workspace_dir).resolve()
-            return str(resolved).startswith(str(workspace))
+            return (workspace / path).resolve().is_relative_to(workspace)
         except Exception:
             return False
 
     async def _llm_approval(
-        self, tool_name: str, tool_input: dict, original_prompt: str,
+        self,
+        approvals: _ApprovalBatcher,
+        tool_name: str,
+        input_summary: str,
+        original_prompt: str,
     ) -> str:
-        """LLM 快速审判：判断操作是否符合原始任务意图"""
+        """LLM 快速审判：判断操作是否符合原始任务意图。
+
+        input_summary 为 ``_summarize_input`` 的结果（由调用方算好传入）。
+        同一次执行中并发到达的请求经 ``approvals`` 合成一次调用。
+        """
         if not self.executor:
             return "allow"  # 无 executor 时降级放行
+        return await approvals.submit(tool_name, input_summary, original_prompt)
 
-        input_summary = _summarize_input(tool_name, tool_input)
-        approval_prompt = (
-            f"用户的原始任务: {original_prompt[:500]}\n\n"
-            f"Claude Code 想要执行: {tool_name}({input_summary})\n\n"
-            "这个操作是否合理且安全？回答 ALLOW 或 DENY 或 UNCERTAIN（拿不准）。"
-            "只回答一个词。"
-        )
-
-        try:
-            response = await self.executor.reply("", approval_prompt, max_tokens=32)
-            response = response.strip().upper()
-            if "DENY" in response:
-                return "deny"
-            if "UNCERTAIN" in response:
-                # 升级为拿不准 → 放行但记录
-                logger.info("LLM 审批不确定: %s(%s)", tool_name, input_summary)
-                return "allow"
-            return "allow"
-        except Exception:
-            logger.debug("LLM 审批调用失败，降级放行", exc_info=True)
-            return "allow"
+    async def _ask_llm(self, prompt: str, max_tokens: int) -> str:
+        return await self.executor.reply("", prompt, max_tokens=max_tokens)
 
     async def _human_approval(
-        self, tool_name: str, tool_input: dict, chat_id: str,
+        self, tool_name: str, input_summary: str, chat_id: str,
     ) -> str:
         """人工审批：发送卡片等待确认"""
-        import uuid
-        approval_id = f"cc_{uuid.uuid4().hex[:8]}"
-        input_summary = _summarize_input(tool_name, tool_input)
+        approval_id = f"cc_{secrets.token_hex(4)}"
         action_desc = f"Claude Code 请求执行高危操作:\n\n**{tool_name}**: {input_summary}"
 
         # 创建审批 future
@@ -537,14 +1024,20 @@ class ClaudeCodeSession:
 
         return "\n\n".join(parts)
 
+    def _prepare_memory_file(self, chat_id: str) -> str | None:
+        """整合记忆上下文并写入临时文件，返回路径（无记忆时为 None）"""
+        return self._write_memory_tempfile(self._build_memory_context(chat_id))
+
     def _build_enriched_prompt(
         self, prompt: str, chat_id: str, context: str,
         memory_path: str | None = None,
+        similar: list[CCExperienceEntry] | None = None,
     ) -> str:
         """构建包含经验和上下文的任务 prompt。
 
         memory_path 指向调用方写入的临时记忆文件（包含 SOUL/MEMORY.md/聊天记忆），
         在 prompt 中以路径引用，让 CC 按需用 Read 工具读取，避免塞进 argv。
+        similar 为调用方已检索好的相似经验；为 None 时在此检索。
         """
         parts: list[str] = []
 
@@ -558,7 +1051,8 @@ class ClaudeCodeSession:
             )
 
         # CC 执行经验
-        similar = self.experience.query_similar(prompt, limit=3)
+        if similar is None:
+            similar = self.experience.query_similar(prompt, limit=3)
         if similar:
             exp_lines: list[str] = []
             for entry in similar:
@@ -608,67 +1102,88 @@ class ClaudeCodeSession:
         prompt: str,
         working_dir: str,
     ) -> None:
-        """记录本次执行经验"""
-        entry = CCExperienceEntry(
-            timestamp=trace.start_time,
-            session_id=result.session_id,
-            prompt=prompt,
-            working_dir=working_dir,
-            success=result.success,
-            cost_usd=result.cost_usd,
-            duration_ms=result.duration_ms,
-            num_turns=result.num_turns,
-            tools_used=sorted(trace.tools_used),
-            tool_calls=trace.tool_calls,
-            files_modified=sorted(trace.files_modified),
-            text_outputs=[t[:500] for t in trace.text_outputs[-5:]],
-            errors=trace.errors,
-            approvals=trace.approvals,
-            trace_summary=trace.build_summary(),
-        )
+        """记录本次执行经验（由 execute 以后台任务调度，异常在此吞掉并记录）"""
+        try:
+            # execute() 已在执行结束后生成过摘要和工具/文件列表，此后 trace 不再变化，直接复用
+            summary = result.trace_summary or trace.build_summary()
+            entry = CCExperienceEntry(
+                timestamp=trace.start_time,
+                session_id=result.session_id,
+                prompt=prompt,
+                working_dir=working_dir,
+                success=result.success,
+                cost_usd=result.cost_usd,
+                duration_ms=result.duration_ms,
+                num_turns=result.num_turns,
+                tools_used=result.tools_used,
+                tool_calls=trace.tool_calls,
+                files_modified=result.files_modified,
+                text_outputs=[t[:500] for t in trace.text_outputs[-5:]],
+                errors=trace.errors,
+                approvals=trace.approvals,
+                trace_summary=summary,
+            )
 
-        # 经验提取（快速 LLM 调用）
-        if self.executor and (result.success or trace.errors):
-            try:
-                lessons_prompt = (
-                    f"根据这次 Claude Code 执行:\n"
-                    f"任务: {prompt[:200]}\n"
-                    f"过程: {trace.build_summary()}\n"
-                    f"结果: {'成功' if result.success else '失败'}\n"
-                    f"{'错误: ' + '; '.join(trace.errors[:3]) if trace.errors else ''}\n\n"
-                    "有什么经验值得下次记住？只提炼可操作的教训，一两句话。"
-                    "如果没有特别的教训，回答「无」。"
-                )
-                lessons = await self.executor.reply("", lessons_prompt, max_tokens=256)
-                lessons = lessons.strip()
-                if lessons and lessons != "无":
-                    entry.lessons = lessons
-                    # 写入 daily log
-                    self.memory.append_daily(
-                        f"- CC 执行: {prompt[:60]} → "
-                        f"{'成功' if result.success else '失败'} | 经验: {lessons[:100]}\n"
+            # 经验提取（快速 LLM 调用）
+            if self.executor and (result.success or trace.errors):
+                try:
+                    lessons_prompt = (
+                        f"根据这次 Claude Code 执行:\n"
+                        f"任务: {prompt[:200]}\n"
+                        f"过程: {summary}\n"
+                        f"结果: {'成功' if result.success else '失败'}\n"
+                        f"{'错误: ' + '; '.join(trace.errors[:3]) if trace.errors else ''}\n\n"
+                        "有什么经验值得下次记住？只提炼可操作的教训，一两句话。"
+                        "如果没有特别的教训，回答「无」。"
                     )
-            except Exception:
-                logger.debug("经验提取失败", exc_info=True)
+                    lessons = await self.executor.reply("", lessons_prompt, max_tokens=256)
+                    lessons = lessons.strip()
+                    if lessons and lessons != "无":
+                        entry.lessons = lessons
+                        # 写入 daily log
+                        self.memory.append_daily(
+                            f"- CC 执行: {prompt[:60]} → "
+                            f"{'成功' if result.success else '失败'} | 经验: {lessons[:100]}\n"
+                        )
+                except Exception:
+                    logger.debug("经验提取失败", exc_info=True)
 
-        self.experience.record(entry)
+            self.experience.record(entry)
+        except Exception:
+            logger.exception("CC 经验记录失败")
 
 
 # ── 工具函数 ──
 
+def _tail_join(chunks: list[str], limit: int) -> str:
+    """等价于 ``"\n".join(chunks)[-limit:]``，但只拼接末尾够用的几段。"""
+    tail: list[str] = []
+    size = 0
+    for chunk in reversed(chunks):
+        tail.append(chunk)
+        size += len(chunk) + 1  # 含分隔符；拼接结果长度为 size - 1
+        if size > limit:
+            break
+    tail.reverse()
+    return "\n".join(tail)[-limit:]
+
+
+# 常见工具的输入摘要提取：一次字典查找代替逐个比较工具名
+_SUMMARIZERS: dict[str, Callable[[dict], str]] = {
+    "Bash": lambda i: (i.get("command", "") or "(空命令)")[:80],
+    "Write": lambda i: i.get("file_path", "?"),
+    "Edit": lambda i: i.get("file_path", "?"),
+    "Read": lambda i: i.get("file_path", "?"),
+    "Glob": lambda i: i.get("pattern", "?")[:60],
+    "Grep": lambda i: i.get("pattern", "?")[:60],
+}
+
+
 def _summarize_input(tool_name: str, tool_input: dict) -> str:
     """生成工具调用输入的简短摘要"""
-    if tool_name == "Bash":
-        cmd = tool_input.get("command", "")
-        return cmd[:80] if cmd else "(空命令)"
-    if tool_name in ("Write", "Edit"):
-        path = tool_input.get("file_path", "?")
-        return path
-    if tool_name == "Read":
-        return tool_input.get("file_path", "?")
-    if tool_name in ("Glob", "Grep"):
-        pattern = tool_input.get("pattern", "?")
-        return pattern[:60]
+    summarizer = _SUMMARIZERS.get(tool_name)
+    if summarizer is not None:
+        return summarizer(tool_input)
     # 通用：取第一个字符串值
     for v in tool_input.values():
         if isinstance(v, str) and v:
@@ -5,10 +5,21 @@ from __future__ import annotations
 import asyncio
 import logging
 import os
+import re
+import shlex
+import shutil
+import signal
+from functools import lru_cache
 from pathlib import Path
+from typing import Any
 
 from lq.config import APIConfig
 
+try:  # 可选加速（speed extra 的 pyahocorasick）：自动机一次扫描所有危险片段
+    import ahocorasick as _ahocorasick
+except ImportError:
+    _ahocorasick = None
+
 logger = logging.getLogger(__name__)
 
 
@@ -35,16 +46,156 @@ _BLOCKED_PREFIXES = (
     "sudo halt",
 )
 
+# 预编译为单个正则，一次扫描完成全部检查；长模式在前，命中时报告最完整的片段。
+# 命令先转小写再匹配，模式同样转小写（否则 "chmod -R 777 /" 永远匹配不上）
+_BLOCKED_RE = re.compile(
+    "|".join(re.escape(b.lower()) for b in sorted(_BLOCKED_COMMANDS, key=len, reverse=True))
+)
+
+
+def _build_blocked_automaton() -> Any:
+    """pyahocorasick（可选依赖）可用时，为危险片段构建 Aho-Corasick 自动机。
+
+    自动机是真正的单遍线性扫描，耗时与片段数量无关；不可用时退回 _BLOCKED_RE。
+    """
+    if _ahocorasick is None:
+        return None
+    automaton = _ahocorasick.Automaton()
+    for blocked in _BLOCKED_COMMANDS:
+        automaton.add_word(blocked.lower(), blocked.lower())
+    automaton.make_automaton()
+    return automaton
+
+
+_BLOCKED_AC = _build_blocked_automaton()
+
+# 含这些字符的命令需要 shell 解释（管道、重定向、变量、通配、多条命令、注释、~ 展开等）
+_SHELL_SYNTAX_RE = re.compile(r"[|;&<>`$*?()\[\]{}~#!\n\\]")
+
+# shell 内建命令，或在 sh -c 里语义特殊的命令：交给 shell 执行。
+# echo / printf / kill / test / pwd 等虽有同名的 /bin 程序，但与 shell 内建版本
+# 行为不同（转义处理、作业号、逻辑路径等），同样交给 shell，保持原有语义
+_SHELL_ONLY = frozenset({
+    ".", ":", "source", "cd", "exit", "export", "unset", "set", "alias", "unalias",
+    "eval", "exec", "ulimit", "umask", "wait", "read", "readonly", "local", "type",
+    "command", "trap", "shift", "return", "break", "continue", "getopts", "hash",
+    "jobs", "fg", "bg", "times", "time",
+    "echo", "printf", "kill", "test", "[", "pwd", "true", "false",
+})
+
+
+def _simple_argv(command: str) -> list[str] | None:
+    """简单命令（单个程序 + 参数，无任何 shell 语法）直接拆成 argv，省掉 /bin/sh 进程。
+
+    不满足条件时返回 None，由 shell 执行。
+    """
+    if _SHELL_SYNTAX_RE.search(command):
+        return None
+    try:
+        argv = shlex.split(command)
+    except ValueError:  # 引号不配对，交给 shell 报错
+        return None
+    if not argv or argv[0] in _SHELL_ONLY or "=" in argv[0]:
+        return None
+    # 带路径的程序按目标 cwd 解析，这里不好判断；PATH 里找不到的交给 shell 给出标准报错
+    if "/" in argv[0] or shutil.which(argv[0]) is None:
+        return None
+    return argv
+
+
 # Bash 输出截断限制
 _MAX_BASH_OUTPUT = 10_000  # 字符
 
+# 子进程输出只保留前这么多字节：UTF-8 每字符至多 4 字节，留足 _MAX_BASH_OUTPUT 个字符，
+# 超出部分读出后直接丢弃，内存占用与子进程输出总量无关
+_CAPTURE_BYTES = _MAX_BASH_OUTPUT * 4
+_READ_CHUNK = 65536
+
+# 子进程 StreamReader 的缓冲上限：缓冲超过 2×limit 时 asyncio 会暂停读管道，
+# 默认 64 KiB 对大输出会频繁 pause/resume；放大后每次 read(_READ_CHUNK) 都能取满
+_STREAM_LIMIT = 1024 * 1024
+
+# 进程退出后等待管道读完的时间（后台子进程可能继承管道、迟迟不给 EOF）
+_DRAIN_TIMEOUT = 2.0
+
+# 超时终止：SIGTERM 后等待这么久仍未退出则 SIGKILL
+_KILL_GRACE = 2.0
+
+_ERR_CLI_MISSING = "claude CLI 未安装，请先安装 Claude Code CLI"
+
+
+async def _read_capped(stream: asyncio.StreamReader, limit: int = _CAPTURE_BYTES) -> tuple[bytes, int]:
+    """分块读到 EOF，只保留前 limit 字节，返回 (保留的字节, 总字节数)"""
+    buf = bytearray()
+    total = 0
+    while chunk := await stream.read(_READ_CHUNK):
+        total += len(chunk)
+        if len(buf) < limit:
+            buf += chunk[: limit - len(buf)]
+    return bytes(buf), total
+
+
+def _signal_group(proc: asyncio.subprocess.Process, sig: int) -> None:
+    """向子进程所在进程组发信号（子进程以 start_new_session 启动，自成一组）"""
+    try:
+        os.killpg(proc.pid, sig)
+    except ProcessLookupError:
+        pass  # 已经全部退出
+
+
+async def _terminate(proc: asyncio.subprocess.Process) -> None:
+    """终止整个进程组并回收子进程。
+
+    只 kill 进程本身时，shell 派生的孙进程会继续运行并占着输出管道；
+    先 SIGTERM 给整组留出清理机会，宽限期后仍在则 SIGKILL。
+    """
+    _signal_group(proc, signal.SIGTERM)
+    try:
+        async with asyncio.timeout(_KILL_GRACE):
+            await proc.wait()
+        return
+    except TimeoutError:
+        pass
+    _signal_group(proc, signal.SIGKILL)
+    await proc.wait()
+
+
+async def _feed_stdin(stdin: asyncio.StreamWriter, data: bytes) -> None:
+    """写入 stdin 后关闭；与读输出并发进行，避免双方管道写满互相等待"""
+    try:
+        stdin.write(data)
+        await stdin.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        pass  # 子进程提前退出、不再读取输入
+    finally:
+        stdin.close()
+
+
+def _decode_capped(data: bytes, total: int, note: str = "输出已截断") -> str:
+    """解码截留的输出，超过 _MAX_BASH_OUTPUT 字符时截断并注明总字节数。
+
+    截留字节的末尾可能切在多字节字符中间（errors="replace" 兜底），但只有总量
+    超过 _CAPTURE_BYTES 时才会发生，此时至少有 _MAX_BASH_OUTPUT 个字符，残缺
+    部分一定落在截断点之后。
+    """
+    text = data.decode("utf-8", errors="replace").strip()
+    if len(text) > _MAX_BASH_OUTPUT:
+        text = text[:_MAX_BASH_OUTPUT] + f"\n... ({note}，共 {total} 字节)"
+    return text
+
 
 class ClaudeCodeExecutor:
     """通过 claude CLI 子进程执行复杂任务"""
 
     def __init__(self, workspace: Path, api_config: APIConfig) -> None:
         self.workspace = workspace
+        self._workspace_str = str(workspace)  # 子进程默认 cwd
         self.api_config = api_config
+        # 需要注入 API 配置时的子进程环境，首次使用时构建后复用
+        # （execve 会复制一份给子进程，共享是安全的）
+        self._env: dict[str, str] | None = None
+        # claude CLI 的绝对路径，找到后缓存（启动子进程时免去逐个 PATH 目录查找）
+        self._claude_path: str | None = None
 
     async def execute(self, prompt: str, timeout: int = 300) -> dict:
         """非阻塞执行 claude 命令，返回 {success, output, error}。
@@ -53,69 +204,7 @@ class ClaudeCodeExecutor:
             prompt: 发送给 Claude Code 的指令。
             timeout: 最大执行时间（秒），默认 5 分钟。
         """
-        # 检测嵌套 Claude Code 会话
-        if _is_nested_claude_session():
-            logger.warning("检测到嵌套 Claude Code 会话，无法启动子进程")
-            return {
-                "success": False,
-                "output": "",
-                "error": (
-                    "当前运行在 Claude Code 会话中，无法启动嵌套的 Claude Code 子进程。"
-                    "建议：使用 run_bash 工具执行命令，或直接使用 read_file/write_file 操作文件。"
-                ),
-            }
-
-        env = self._build_env()
-
-        try:
-            proc = await asyncio.create_subprocess_exec(
-                "claude",
-                "--print",
-                "--dangerously-skip-permissions",
-                stdin=asyncio.subprocess.PIPE,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                env=env,
-                cwd=str(self.workspace),
-            )
-
-            stdout, stderr = await asyncio.wait_for(
-                proc.communicate(input=prompt.encode("utf-8")),
-                timeout=timeout,
-            )
-
-            output = stdout.decode("utf-8").strip()
-            error = stderr.decode("utf-8").strip()
-
-            # 截断过长的输出
-            if len(output) > _MAX_BASH_OUTPUT:
-                output = output[:_MAX_BASH_OUTPUT] + f"\n... (输出已截断，共 {len(stdout)} 字节)"
-
-            if proc.returncode == 0:
-                logger.info("CC 执行成功：%s...", output[:200])
-                return {"success": True, "output": output, "error": ""}
-            else:
-                logger.warning("CC 执行失败 (code=%d): %s", proc.returncode, error[:200])
-                return {"success": False, "output": output, "error": error}
-
-        except asyncio.TimeoutError:
-            logger.error("CC 执行超时 (%ds)", timeout)
-            try:
-                proc.kill()
-            except Exception:
-                pass
-            return {
-                "success": False,
-                "output": "",
-                "error": (
-                    f"Claude Code 执行超时 ({timeout}s)，"
-                    f"如需更长执行时间，可在调用时指定更大的 timeout 参数"
-                    f"（如 timeout={timeout * 2}）"
-                ),
-            }
-        except FileNotFoundError:
-            logger.error("claude CLI 未找到")
-            return {"success": False, "output": "", "error": "claude CLI 未安装，请先安装 Claude Code CLI"}
+        return await self.execute_with_context(prompt, timeout=timeout)
 
     async def execute_with_context(
         self,
@@ -147,46 +236,40 @@ class ClaudeCodeExecutor:
         full_prompt = prompt
         if context:
             full_prompt = f"背景信息：{context}\n\n任务：{prompt}"
+        # 在启动子进程和计时之前编码好，超时预算只花在子进程本身
+        prompt_bytes = full_prompt.encode("utf-8")
+
+        if self._resolve_cli() is None:
+            logger.error("claude CLI 未找到")
+            return {"success": False, "output": "", "error": _ERR_CLI_MISSING}
 
         env = self._build_env()
-        cwd = working_dir or str(self.workspace)
+        cwd = working_dir or self._workspace_str
 
         try:
-            proc = await asyncio.create_subprocess_exec(
-                "claude",
-                "--print",
-                "--dangerously-skip-permissions",
-                stdin=asyncio.subprocess.PIPE,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                env=env,
-                cwd=cwd,
-            )
-
-            stdout, stderr = await asyncio.wait_for(
-                proc.communicate(input=full_prompt.encode("utf-8")),
-                timeout=timeout,
-            )
-
-            output = stdout.decode("utf-8").strip()
-            error = stderr.decode("utf-8").strip()
-
-            if len(output) > _MAX_BASH_OUTPUT:
-                output = output[:_MAX_BASH_OUTPUT] + f"\n... (输出已截断，共 {len(stdout)} 字节)"
+            proc = await self._spawn(cwd, env)
+
+            async with asyncio.timeout(timeout):
+                (stdout, stdout_total), (stderr, stderr_total), _, _ = await asyncio.gather(
+                    _read_capped(proc.stdout),
+                    _read_capped(proc.stderr),
+                    _feed_stdin(proc.stdin, prompt_bytes),
+                    proc.wait(),
+                )
+
+            output = _decode_capped(stdout, stdout_total)
+            error = _decode_capped(stderr, stderr_total, "错误输出已截断")
 
             if proc.returncode == 0:
-                logger.info("CC 执行成功 (dir=%s): %s...", cwd, output[:200])
+                logger.info("CC 执行成功 (dir=%s): %.200s...", cwd, output)
                 return {"success": True, "output": output, "error": ""}
             else:
-                logger.warning("CC 执行失败 (dir=%s, code=%d): %s", cwd, proc.returncode, error[:200])
+                logger.warning("CC 执行失败 (dir=%s, code=%d): %.200s", cwd, proc.returncode, error)
                 return {"success": False, "output": output, "error": error}
 
         except asyncio.TimeoutError:
             logger.error("CC 执行超时 (%ds, dir=%s)", timeout, cwd)
-            try:
-                proc.kill()
-            except Exception:
-                pass
+            await _terminate(proc)
             return {
                 "success": False,
                 "output": "",
@@ -197,22 +280,78 @@ class ClaudeCodeExecutor:
                 ),
             }
         except FileNotFoundError:
+            # 缓存的路径失效（CLI 被卸载或移动），下次重新查找
+            self._claude_path = None
             logger.error("claude CLI 未找到")
-            return {"success": False, "output": "", "error": "claude CLI 未安装"}
-
-    def _build_env(self) -> dict[str, str]:
+            return {"success": False, "output": "", "error": _ERR_CLI_MISSING}
+
+    # ── 子进程 ──
+
+    def _resolve_cli(self) -> str | None:
+        """查找 claude CLI；找不到时不缓存，安装后无需重启即可使用"""
+        if self._claude_path is None:
+            self._claude_path = shutil.which("claude")
+        return self._claude_path
+
+    async def _spawn(self, cwd: str, env: dict[str, str] | None) -> asyncio.subprocess.Process:
+        return await asyncio.create_subprocess_exec(
+            self._claude_path or "claude",
+            "--print",
+            "--dangerously-skip-permissions",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=env,
+            cwd=cwd,
+            start_new_session=True,
+            limit=_STREAM_LIMIT,
+        )
+
+    def _build_env(self) -> dict[str, str] | None:
         """构建子进程环境变量。
-        
+
         不强制覆盖 ANTHROPIC_* 环境变量，让 claude CLI 使用其原生配置。
         如果环境中已存在这些变量，保持不变；否则从 api_config 注入作为后备。
+        无需注入时返回 None，子进程直接继承当前环境，不复制整个 os.environ；
+        需要注入时构建的环境在首次调用后缓存复用。
         """
-        env = os.environ.copy()
+        overrides: dict[str, str] = {}
         # 只在环境变量不存在时才注入，优先使用环境配置
-        if "ANTHROPIC_API_KEY" not in env and self.api_config.api_key:
-            env["ANTHROPIC_API_KEY"] = self.api_config.api_key
-        if "ANTHROPIC_BASE_URL" not in env and self.api_config.base_url:
-            env["ANTHROPIC_BASE_URL"] = self.api_config.base_url
-        return env
+        if "ANTHROPIC_API_KEY" not in os.environ and self.api_config.api_key:
+            overrides["ANTHROPIC_API_KEY"] = self.api_config.api_key
+        if "ANTHROPIC_BASE_URL" not in os.environ and self.api_config.base_url:
+            overrides["ANTHROPIC_BASE_URL"] = self.api_config.base_url
+        if not overrides:
+            return None
+        if self._env is None:
+            self._env = {**os.environ, **overrides}
+        return self._env
+
+
+@lru_cache(maxsize=512)
+def _check_safety(command: str) -> str:
+    """检查命令安全性，返回空字符串表示安全，否则返回拒绝原因
+
+    agent 循环里同一条命令（git status、pytest ...）常反复出现，结果按原始命令缓存。
+    """
+    cmd_lower = command.strip().lower()
+
+    # 检查完全匹配的危险命令
+    if _BLOCKED_AC is not None:
+        hit = next(_BLOCKED_AC.iter(cmd_lower), None)
+        blocked = hit[1] if hit else None
+    else:
+        m = _BLOCKED_RE.search(cmd_lower)
+        blocked = m.group() if m else None
+    if blocked:
+        return f"命令包含危险操作：{blocked}"
+
+    # 检查前缀匹配（startswith 接受元组，一次调用在 C 层比较全部前缀）
+    if cmd_lower.startswith(_BLOCKED_PREFIXES):
+        prefix = next(p for p in _BLOCKED_PREFIXES if cmd_lower.startswith(p))
+        return f"命令以危险前缀开头：{prefix}"
+
+    return ""
 
 
 class BashExecutor:
@@ -220,6 +359,7 @@ class BashExecutor:
 
     def __init__(self, workspace: Path) -> None:
         self.workspace = workspace
+        self._workspace_str = str(workspace)  # 子进程默认 cwd
 
     async def execute(
         self,
@@ -237,7 +377,7 @@ class BashExecutor:
             idle_timeout: 无输出超时（秒），默认 300 秒（5 分钟）。如果超过此时间无任何输出则中断。
         """
         # 安全检查
-        safety_check = self._check_safety(command)
+        safety_check = _check_safety(command)
         if safety_check:
             return {
                 "success": False,
@@ -246,49 +386,61 @@ class BashExecutor:
                 "exit_code": -1,
             }
 
-        cwd = working_dir or str(self.workspace)
-        logger.info("Bash 执行：%s (dir=%s, timeout=%ds, idle_timeout=%ds)", command[:100], cwd, timeout, idle_timeout)
+        cwd = working_dir or self._workspace_str
+        # 日志里用 %.Ns 截断：只在记录真正输出时才切片，级别被过滤时零开销
+        logger.info("Bash 执行：%.100s (dir=%s, timeout=%ds, idle_timeout=%ds)", command, cwd, timeout, idle_timeout)
 
         try:
-            proc = await asyncio.create_subprocess_shell(
-                command,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                cwd=cwd,
-                env=os.environ.copy(),
-            )
+            argv = _simple_argv(command)
+            if argv is not None:
+                proc = await asyncio.create_subprocess_exec(
+                    *argv,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    cwd=cwd,
+                    start_new_session=True,
+                    limit=_STREAM_LIMIT,
+                )
+            else:
+                proc = await asyncio.create_subprocess_shell(
+                    command,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    cwd=cwd,
+                    start_new_session=True,
+                    limit=_STREAM_LIMIT,
+                )
 
             # 双超时机制：整体超时 + 无输出超时
             start_time = asyncio.get_event_loop().time()
             last_output_time = start_time
             
-            output_chunks = []
-            error_chunks = []
-            
-            # 创建读取任务
-            async def read_stream(stream, chunks, is_stderr=False):
+            # 每个流: [截留的字节, 总字节数]
+            captured = {"stdout": [bytearray(), 0], "stderr": [bytearray(), 0]}
+
+            # 创建读取任务：分块读取，超过 _CAPTURE_BYTES 的部分直接丢弃
+            async def read_stream(stream, slot):
                 nonlocal last_output_time
+                buf = slot[0]
                 try:
-                    while True:
-                        line = await stream.readline()
-                        if not line:
-                            break
-                        chunk = line.decode("utf-8", errors="replace")
-                        chunks.append(chunk)
+                    while chunk := await stream.read(_READ_CHUNK):
+                        slot[1] += len(chunk)
+                        if len(buf) < _CAPTURE_BYTES:
+                            buf += chunk[: _CAPTURE_BYTES - len(buf)]
                         last_output_time = asyncio.get_event_loop().time()
-                        
+
                         # 检查整体超时
                         elapsed = last_output_time - start_time
                         if elapsed > timeout:
                             logger.warning("Bash 执行整体超时 (%ds)", timeout)
-                            proc.kill()
+                            _signal_group(proc, signal.SIGKILL)
                             break
-                        
+
                         # 检查无输出超时（仅在读取过程中检查）
                         idle = last_output_time - start_time
                         if idle > idle_timeout:
                             logger.warning("Bash 执行无输出超时 (%ds)", idle_timeout)
-                            proc.kill()
+                            _signal_group(proc, signal.SIGKILL)
                             break
                 except asyncio.CancelledError:
                     pass
@@ -296,41 +448,36 @@ class BashExecutor:
                     logger.error("读取流时出错：%s", e)
 
             # 并行读取 stdout 和 stderr
-            read_stdout = asyncio.create_task(read_stream(proc.stdout, output_chunks))
-            read_stderr = asyncio.create_task(read_stream(proc.stderr, error_chunks, is_stderr=True))
-            
+            readers = [
+                asyncio.create_task(read_stream(proc.stdout, captured["stdout"])),
+                asyncio.create_task(read_stream(proc.stderr, captured["stderr"])),
+            ]
+
             # 等待进程结束或超时
             try:
-                await asyncio.wait_for(proc.wait(), timeout=timeout)
+                async with asyncio.timeout(timeout):
+                    await proc.wait()
             except asyncio.TimeoutError:
                 logger.error("Bash 执行整体超时 (%ds)", timeout)
-                proc.kill()
-            
-            # 取消读取任务
-            read_stdout.cancel()
-            read_stderr.cancel()
-            
-            try:
-                await asyncio.gather(read_stdout, read_stderr, return_exceptions=True)
-            except Exception:
-                pass
+                await _terminate(proc)
 
-            output = "".join(output_chunks).strip()
-            error = "".join(error_chunks).strip()
+            # 进程已退出：读完管道里剩余的输出，后台子进程占着管道不放时不再等
+            _, still_reading = await asyncio.wait(readers, timeout=_DRAIN_TIMEOUT)
+            for task in still_reading:
+                task.cancel()
+            if still_reading:
+                await asyncio.gather(*still_reading, return_exceptions=True)
 
-            # 截断过长的输出
-            if len(output) > _MAX_BASH_OUTPUT:
-                output = output[:_MAX_BASH_OUTPUT] + f"\n... (输出已截断，共 {len(output)} 字节)"
-            if len(error) > _MAX_BASH_OUTPUT:
-                error = error[:_MAX_BASH_OUTPUT] + f"\n... (错误输出已截断)"
+            output = _decode_capped(*captured["stdout"])
+            error = _decode_capped(*captured["stderr"], "错误输出已截断")
 
             exit_code = proc.returncode or 0
             success = exit_code == 0
 
             if success:
-                logger.info("Bash 执行成功 (exit=%d): %s...", exit_code, output[:200])
+                logger.info("Bash 执行成功 (exit=%d): %.200s...", exit_code, output)
             else:
-                logger.warning("Bash 执行失败 (exit=%d): %s", exit_code, error[:200])
+                logger.warning("Bash 执行失败 (exit=%d): %.200s", exit_code, error)
 
             return {
                 "success": success,
@@ -347,20 +494,3 @@ class BashExecutor:
                 "error": f"执行异常：{str(e)}",
                 "exit_code": -1,
             }
-
-    @staticmethod
-    def _check_safety(command: str) -> str:
-        """检查命令安全性，返回空字符串表示安全，否则返回拒绝原因"""
-        cmd_lower = command.strip().lower()
-
-        # 检查完全匹配的危险命令
-        for blocked in _BLOCKED_COMMANDS:
-            if blocked in cmd_lower:
-                return f"命令包含危险操作：{blocked}"
-
-        # 检查前缀匹配
-        for prefix in _BLOCKED_PREFIXES:
-            if cmd_lower.startswith(prefix):
-                return f"命令以危险前缀开头：{prefix}"
-
-        return ""
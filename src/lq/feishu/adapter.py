@@ -8,11 +8,17 @@ import logging
 import re
 import threading
 import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Any
+from typing import Any, Awaitable, Callable
 
 import httpx
 
+try:  # 可选加速（speed extra 的 pyahocorasick）：名字很多时用 Aho-Corasick 自动机做 @提及多模式匹配
+    import ahocorasick as _ahocorasick
+except ImportError:
+    _ahocorasick = None
+
 from lq.feishu.listener import FeishuListener
 from lq.feishu.sender import FeishuSender
 from lq.platform.adapter import PlatformAdapter
@@ -46,10 +52,25 @@ _MSG_TYPE_MAP: dict[str, MessageType] = {
     "share_chat": MessageType.SHARE,
     "share_user": MessageType.SHARE,
 }
+# 入站热路径上直接用绑定好的 get 与默认值，省去每条消息的属性查找
+_MSG_TYPE_GET = _MSG_TYPE_MAP.get
+_MT_UNKNOWN = MessageType.UNKNOWN
 
 # 意图信号使用的 emoji
 THINKING_EMOJI = "OnIt"
 
+# disconnect 时投入 _raw_queue，唤醒并结束事件转换协程
+_SHUTDOWN = object()
+
+# groups.json 写入防抖（秒）：短时间内多次变更只落盘一次
+_KNOWN_GROUPS_SAVE_DELAY = 2.0
+
+# bot 消息轮询：同时拉取的群数上限
+_POLL_CONCURRENCY = 4
+
+# 轮询去重：每个群最多记住的 message_id 数（按插入序淘汰）
+_POLLED_IDS_MAX = 256
+
 
 class FeishuAdapter(PlatformAdapter):
     """飞书平台适配器。
@@ -78,17 +99,22 @@ class FeishuAdapter(PlatformAdapter):
         self._tasks: list[asyncio.Task] = []
         self._shutdown = asyncio.Event()
 
-        # message_id → chat_id 映射（用于 reaction 事件关联群聊）
-        self._msg_chat_map: dict[str, str] = {}
+        # message_id → chat_id 映射（用于 reaction 事件关联群聊），LRU 淘汰
+        self._msg_chat_map: OrderedDict[str, str] = OrderedDict()
         self._msg_chat_map_max = 500
 
-        # 活跃群聊跟踪
+        # 活跃群聊跟踪：chat_id → 最近活跃时间（time.monotonic）
         self._active_groups: dict[str, float] = {}
         self._known_group_ids: set[str] = set()
-        self._polled_msg_ids: dict[str, set[str]] = {}
+        self._save_task: asyncio.Task | None = None
+        self._groups_dirty = False  # 有未写入 groups.json 的变更
+        self._polled_msg_ids: dict[str, OrderedDict[str, None]] = {}
         self._poll_fail_count: dict[str, int] = {}
 
         self._identity: BotIdentity | None = None
+        # 出站 @提及：(名字缓存 version, 匹配器, name → open_id)
+        # 匹配器为 Aho-Corasick 自动机（pyahocorasick 可用时）或交替正则
+        self._mention_matcher_cache: tuple[int, Any, dict[str, str]] | None = None
 
     # ── 身份 ──
 
@@ -129,8 +155,8 @@ class FeishuAdapter(PlatformAdapter):
         feishu_thread.start()
         logger.info("飞书 WebSocket 线程已启动")
 
-        # 加载已知群聊
-        self._load_known_groups()
+        # 加载已知群聊（文件读取放到线程，不阻塞事件循环）
+        self._known_group_ids |= await asyncio.to_thread(self._read_known_groups)
 
         # 启动事件转换协程和轮询协程
         self._tasks.append(
@@ -142,12 +168,18 @@ class FeishuAdapter(PlatformAdapter):
 
     async def disconnect(self) -> None:
         self._shutdown.set()
+        self._raw_queue.put_nowait(_SHUTDOWN)
         for t in self._tasks:
             t.cancel()
         if self._tasks:
             await asyncio.wait(self._tasks, timeout=3.0)
         self._tasks.clear()
-        self._save_known_groups()
+        # 取消防抖保存并等它结束（进行中的写入会先落盘），再做最终写入
+        save_task, self._save_task = self._save_task, None
+        if save_task is not None:
+            save_task.cancel()
+            await asyncio.gather(save_task, return_exceptions=True)
+        await asyncio.to_thread(self._write_known_groups, sorted(self._known_group_ids))
 
     # ── 表达 ──
 
@@ -271,47 +303,88 @@ class FeishuAdapter(PlatformAdapter):
 
     def _convert_outgoing_mentions(self, text: str) -> str:
         """将 @name 替换为飞书 <at> 标签。"""
+        # 大多数消息没有 @，直接跳过匹配器构建与扫描
+        if not text or "@" not in text:
+            return text
+        matcher, name_to_id = self._mention_matcher()
+        if matcher is None:
+            return text
+        if _ahocorasick is None:
+            return matcher.sub(
+                lambda m: f'<at user_id="{name_to_id[m.group(1)]}">{m.group(1)}</at>',
+                text,
+            )
+        # 自动机给出全部命中 (结束下标, 名字)；与正则一致，取最左、同起点取最长，跳过重叠
+        spans = sorted(
+            ((end - len(name), end + 1, name) for end, name in matcher.iter(text)),
+            key=lambda span: (span[0], -span[1]),
+        )
+        parts: list[str] = []
+        pos = 0
+        for start, stop, name in spans:
+            if start < pos:
+                continue
+            parts.append(text[pos:start])
+            parts.append(f'<at user_id="{name_to_id[name]}">{name}</at>')
+            pos = stop
+        parts.append(text[pos:])
+        return "".join(parts)
+
+    def _mention_matcher(self) -> tuple[Any, dict[str, str]]:
+        """名字缓存变化时重建 @name 匹配器，否则复用上次的结果。"""
         cache = self._sender._user_name_cache
-        # 按名字长度降序匹配，避免子串冲突
+        cached = self._mention_matcher_cache
+        if cached is not None and cached[0] == cache.version:
+            return cached[1], cached[2]
         name_to_id: dict[str, str] = {}
         for uid, name in cache.items():
             if name and uid.startswith("ou_"):
                 name_to_id[name] = uid
-        for name in sorted(name_to_id, key=len, reverse=True):
-            uid = name_to_id[name]
-            tag = f'<at user_id="{uid}">{name}</at>'
-            text = text.replace(f"@{name}", tag)
-        return text
+        matcher: Any = None
+        if name_to_id and _ahocorasick is not None:
+            matcher = _ahocorasick.Automaton()
+            for name in name_to_id:
+                matcher.add_word(f"@{name}", name)
+            matcher.make_automaton()
+        elif name_to_id:
+            # 按名字长度降序排列，避免子串冲突
+            names = sorted(name_to_id, key=len, reverse=True)
+            matcher = re.compile("@(" + "|".join(map(re.escape, names)) + ")")
+        self._mention_matcher_cache = (cache.version, matcher, name_to_id)
+        return matcher, name_to_id
 
     # ── 内部：事件转换 ──
 
     async def _event_converter(self) -> None:
         """从 _raw_queue 读取原始飞书事件，转换为标准格式后投入用户队列。"""
         logger.info("飞书事件转换器启动")
-        while not self._shutdown.is_set():
+        while True:
             try:
-                data = await asyncio.wait_for(self._raw_queue.get(), timeout=1.0)
-            except asyncio.TimeoutError:
-                continue
+                data = await self._raw_queue.get()
             except asyncio.CancelledError:
                 break
-
-            try:
+            # 一次取完已排队的事件，突发时只让出一次事件循环
+            batch = [data]
+            while True:
+                try:
+                    batch.append(self._raw_queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+
+            for data in batch:
+                if data is _SHUTDOWN:
+                    logger.info("飞书事件转换器已停止")
+                    return
                 event_type = data.get("event_type", "")
-                if event_type == "im.message.receive_v1":
-                    await self._convert_message_event(data)
-                elif event_type == "reaction.created":
-                    self._convert_reaction_event(data)
-                elif event_type == "bot.added":
-                    self._convert_bot_added(data)
-                elif event_type == "user.added":
-                    self._convert_user_added(data)
-                elif event_type == "card.action.trigger":
-                    self._convert_card_action(data)
-                else:
+                handler = self._HANDLERS.get(event_type)
+                if handler is None:
                     logger.debug("忽略飞书事件类型: %s", event_type)
-            except Exception:
-                logger.exception("转换飞书事件失败: %s", data.get("event_type", "?"))
+                    continue
+                try:
+                    await handler(self, data)
+                except Exception:
+                    logger.exception("转换飞书事件失败: %s", data.get("event_type", "?"))
+            await asyncio.sleep(0)
 
         logger.info("飞书事件转换器已停止")
 
@@ -336,15 +409,11 @@ class FeishuAdapter(PlatformAdapter):
 
         # 标记群聊为活跃
         if chat_type_str == "group":
-            self._active_groups[chat_id] = time.time()
+            self._active_groups[chat_id] = time.monotonic()
             self._known_group_ids.add(chat_id)
 
-        # 提取文本
-        text = self._extract_text(message)
-        # 提取图片 key
-        image_keys = self._extract_image_keys(message)
-        # 提取音频 key
-        audio_keys = self._extract_audio_keys(message, msg_type_str)
+        # 提取文本、图片 key、音频 key（content 只解析一次）
+        text, image_keys, audio_keys = self._extract_content(message, msg_type_str)
 
         # 解析 @提及
         raw_mentions = getattr(message, "mentions", None)
@@ -404,7 +473,7 @@ class FeishuAdapter(PlatformAdapter):
             sender_id=sender_open_id,
             sender_type=sender_type,
             sender_name=sender_name,
-            message_type=_MSG_TYPE_MAP.get(msg_type_str, MessageType.UNKNOWN),
+            message_type=_MSG_TYPE_GET(msg_type_str, _MT_UNKNOWN),
             text=text,
             mentions=mentions,
             is_mention_bot=is_mention_bot,
@@ -418,14 +487,16 @@ class FeishuAdapter(PlatformAdapter):
 
         self._queue.put_nowait({"event_type": "message", "message": msg})
 
-    def _convert_reaction_event(self, data: dict) -> None:
+    async def _convert_reaction_event(self, data: dict) -> None:
         """将飞书 reaction 事件转换为标准 Reaction。"""
         emoji = data.get("emoji_type", "")
         operator_id = data.get("operator_id", "")
         message_id = data.get("message_id", "")
 
-        # 查找 chat_id
+        # 查找 chat_id（命中即视为最近使用，后续 reaction 大多还落在这条消息上）
         chat_id = self._msg_chat_map.get(message_id, "")
+        if chat_id:
+            self._msg_chat_map.move_to_end(message_id)
 
         is_thinking = emoji == THINKING_EMOJI
         reaction = Reaction(
@@ -439,11 +510,11 @@ class FeishuAdapter(PlatformAdapter):
         )
         self._queue.put_nowait({"event_type": "reaction", "reaction": reaction})
 
-    def _convert_bot_added(self, data: dict) -> None:
+    async def _convert_bot_added(self, data: dict) -> None:
         """将 bot 入群事件转换为标准 member_change。"""
         chat_id = data.get("chat_id", "")
         if chat_id:
-            self._active_groups[chat_id] = time.time()
+            self._active_groups[chat_id] = time.monotonic()
             self._known_group_ids.add(chat_id)
         self._queue.put_nowait({
             "event_type": "member_change",
@@ -452,7 +523,7 @@ class FeishuAdapter(PlatformAdapter):
             "users": [],
         })
 
-    def _convert_user_added(self, data: dict) -> None:
+    async def _convert_user_added(self, data: dict) -> None:
         """将用户入群事件转换为标准 member_change。"""
         chat_id = data.get("chat_id", "")
         raw_users = data.get("users", [])
@@ -470,7 +541,7 @@ class FeishuAdapter(PlatformAdapter):
             "users": users,
         })
 
-    def _convert_card_action(self, data: dict) -> None:
+    async def _convert_card_action(self, data: dict) -> None:
         """将卡片交互转换为标准 CardAction。"""
         event = data.get("event")
         if not event:
@@ -496,27 +567,52 @@ class FeishuAdapter(PlatformAdapter):
         )
         self._queue.put_nowait({"event_type": "interaction", "action": card_action})
 
+    # 飞书原始事件类型 → 转换协程
+    _HANDLERS: dict[str, Callable[[FeishuAdapter, dict], Awaitable[None]]] = {
+        "im.message.receive_v1": _convert_message_event,
+        "reaction.created": _convert_reaction_event,
+        "bot.added": _convert_bot_added,
+        "user.added": _convert_user_added,
+        "card.action.trigger": _convert_card_action,
+    }
+
     # ── 内部：飞书消息解析 ──
 
     @staticmethod
-    def _extract_text(message: Any) -> str:
-        """从飞书消息中提取文本，支持 text 和 post 格式。"""
+    def _extract_content(
+        message: Any, msg_type_str: str,
+    ) -> tuple[str, list[str], list[str]]:
+        """解析一次飞书消息 content，返回 (文本, 图片 key 列表, 音频 key 列表)。
+
+        文本支持 text 和 post 格式（post 富文本转为 Markdown）。
+        """
         try:
             content = json.loads(message.content)
         except (json.JSONDecodeError, TypeError):
-            return ""
+            return "", [], []
+        if not isinstance(content, dict):
+            return "", [], []
+
+        if msg_type_str == "audio":
+            file_key = content.get("file_key", "")
+            return "", [], [f"audio:{file_key}"] if file_key else []
+
+        if msg_type_str == "image":
+            key = content.get("image_key", "")
+            return content.get("text", ""), [key] if key else [], []
 
         if "text" in content:
-            return content["text"]
+            return content["text"], [], []
 
-        # post 富文本 → Markdown
+        # post 富文本 → Markdown，同一次遍历收集图片 key
         post = content.get("post") or content
         if isinstance(post, dict) and not post.get("content"):
             post = next(iter(post.values()), {}) if post else {}
         if not isinstance(post, dict):
-            return ""
+            return "", [], []
 
         lines: list[str] = []
+        image_keys: list[str] = []
         title = post.get("title", "")
         if title:
             lines.append(f"**{title}**")
@@ -536,54 +632,14 @@ class FeishuAdapter(PlatformAdapter):
                     parts.append(f"@{name}")
                 elif tag == "img":
                     parts.append("[图片]")
+                    key = elem.get("image_key", "")
+                    if key:
+                        image_keys.append(key)
                 elif tag == "media":
                     parts.append("[媒体]")
             lines.append("".join(parts))
 
-        return "\n".join(lines)
-
-    @staticmethod
-    def _extract_image_keys(message: Any) -> list[str]:
-        """从飞书消息中提取所有图片的 image_key。"""
-        keys: list[str] = []
-        try:
-            content = json.loads(message.content)
-        except (json.JSONDecodeError, TypeError):
-            return keys
-
-        msg_type = getattr(message, "message_type", None) or ""
-        if msg_type == "image":
-            key = content.get("image_key", "")
-            if key:
-                keys.append(key)
-            return keys
-
-        # post 富文本
-        post = content.get("post") or content
-        if isinstance(post, dict) and not post.get("content"):
-            post = next(iter(post.values()), {}) if post else {}
-        if not isinstance(post, dict):
-            return keys
-
-        for paragraph in post.get("content", []):
-            for elem in paragraph:
-                if elem.get("tag") == "img":
-                    key = elem.get("image_key", "")
-                    if key:
-                        keys.append(key)
-        return keys
-
-    @staticmethod
-    def _extract_audio_keys(message: Any, msg_type_str: str) -> list[str]:
-        """从飞书音频消息中提取 file_key。"""
-        if msg_type_str != "audio":
-            return []
-        try:
-            content = json.loads(message.content)
-            file_key = content.get("file_key", "")
-            return [f"audio:{file_key}"] if file_key else []
-        except (json.JSONDecodeError, TypeError):
-            return []
+        return "\n".join(lines), image_keys, []
 
     # ── 内部：bot 消息轮询（飞书补偿） ──
 
@@ -593,7 +649,7 @@ class FeishuAdapter(PlatformAdapter):
         while not self._shutdown.is_set():
             try:
                 await asyncio.sleep(3.0)
-                active = self._get_poll_targets()
+                active = self._get_poll_targets(time.monotonic())
                 if not active:
                     continue
                 identity = self._identity
@@ -602,89 +658,103 @@ class FeishuAdapter(PlatformAdapter):
                     bot_self_ids.add(identity.bot_id)
                 bot_self_ids.add(self._app_id)
 
-                for chat_id in active:
-                    if self._shutdown.is_set():
-                        break
-                    if self._poll_fail_count.get(chat_id, 0) >= 3:
-                        continue
-                    try:
-                        api_msgs = await self._sender.fetch_chat_messages(chat_id, 10)
-                    except httpx.HTTPStatusError as exc:
-                        if exc.response.status_code in (400, 403):
-                            self._poll_fail_count[chat_id] = self._poll_fail_count.get(chat_id, 0) + 1
-                            if self._poll_fail_count[chat_id] >= 3:
-                                logger.warning("群 %s 连续 3 次失败，停止轮询", chat_id[-8:])
-                                self._known_group_ids.discard(chat_id)
-                                self._active_groups.pop(chat_id, None)
-                                self._save_known_groups()
-                                # 投递 bot_left 事件
-                                self._queue.put_nowait({
-                                    "event_type": "member_change",
-                                    "chat_id": chat_id,
-                                    "change_type": "bot_left",
-                                    "users": [],
-                                })
-                        continue
-                    except Exception:
-                        logger.warning("轮询群 %s 失败", chat_id[-8:], exc_info=True)
-                        continue
-
-                    self._poll_fail_count.pop(chat_id, None)
-                    if not api_msgs:
-                        continue
-
-                    for msg in api_msgs:
-                        if msg.get("sender_type") != "app":
-                            continue
-                        self._sender.register_bot_member(chat_id, msg["sender_id"])
-                        if msg.get("sender_id") in bot_self_ids:
-                            continue
-                        # 去重
-                        known = self._polled_msg_ids.setdefault(chat_id, set())
-                        msg_id = msg.get("message_id", "")
-                        if msg_id in known:
-                            continue
-                        known.add(msg_id)
-
-                        sender_name = await self._sender.resolve_name(msg["sender_id"])
-                        self._record_msg_chat(msg_id, chat_id)
-
-                        polled_msg = IncomingMessage(
-                            message_id=msg_id,
-                            chat_id=chat_id,
-                            chat_type=ChatType.GROUP,
-                            sender_id=msg["sender_id"],
-                            sender_type=SenderType.BOT,
-                            sender_name=sender_name,
-                            message_type=MessageType.TEXT,
-                            text=msg.get("text", ""),
-                            reply_to_id=msg.get("parent_id", ""),
-                            timestamp=int(msg.get("create_time", "0") or "0"),
-                            platform="feishu",
-                        )
-                        self._queue.put_nowait({"event_type": "message", "message": polled_msg})
-
-                    if len(active) > 1:
-                        await asyncio.sleep(1.0)
+                # 多个群并发拉取（限并发数），整轮耗时约等于单次 RTT
+                targets = [
+                    cid for cid in active if self._poll_fail_count.get(cid, 0) < 3
+                ]
+                sem = asyncio.Semaphore(_POLL_CONCURRENCY)
+
+                async def _poll_one(chat_id: str) -> None:
+                    async with sem:
+                        await self._poll_chat(chat_id, bot_self_ids)
+
+                results = await asyncio.gather(
+                    *(_poll_one(cid) for cid in targets), return_exceptions=True,
+                )
+                for cid, res in zip(targets, results):
+                    if isinstance(res, Exception):
+                        logger.error("轮询群 %s 异常", cid[-8:], exc_info=res)
             except asyncio.CancelledError:
                 break
             except Exception:
                 logger.exception("bot 消息轮询异常")
         logger.info("飞书 bot 消息轮询已停止")
 
+    async def _poll_chat(self, chat_id: str, bot_self_ids: set[str]) -> None:
+        """拉取单个群的最近消息，把未见过的其他 bot 消息投入用户队列。"""
+        if self._shutdown.is_set():
+            return
+        try:
+            api_msgs = await self._sender.fetch_chat_messages(chat_id, 10)
+        except httpx.HTTPStatusError as exc:
+            if exc.response.status_code in (400, 403):
+                self._poll_fail_count[chat_id] = self._poll_fail_count.get(chat_id, 0) + 1
+                if self._poll_fail_count[chat_id] >= 3:
+                    logger.warning("群 %s 连续 3 次失败，停止轮询", chat_id[-8:])
+                    self._known_group_ids.discard(chat_id)
+                    self._active_groups.pop(chat_id, None)
+                    self._schedule_save_known_groups()
+                    # 投递 bot_left 事件
+                    self._queue.put_nowait({
+                        "event_type": "member_change",
+                        "chat_id": chat_id,
+                        "change_type": "bot_left",
+                        "users": [],
+                    })
+            return
+        except Exception:
+            logger.warning("轮询群 %s 失败", chat_id[-8:], exc_info=True)
+            return
+
+        self._poll_fail_count.pop(chat_id, None)
+        if not api_msgs:
+            return
+
+        for msg in api_msgs:
+            if msg.get("sender_type") != "app":
+                continue
+            self._sender.register_bot_member(chat_id, msg["sender_id"])
+            if msg.get("sender_id") in bot_self_ids:
+                continue
+            # 去重
+            known = self._polled_msg_ids.setdefault(chat_id, OrderedDict())
+            msg_id = msg.get("message_id", "")
+            if msg_id in known:
+                continue
+            known[msg_id] = None
+            if len(known) > _POLLED_IDS_MAX:
+                known.popitem(last=False)
+
+            sender_name = await self._sender.resolve_name(msg["sender_id"])
+            self._record_msg_chat(msg_id, chat_id)
+
+            polled_msg = IncomingMessage(
+                message_id=msg_id,
+                chat_id=chat_id,
+                chat_type=ChatType.GROUP,
+                sender_id=msg["sender_id"],
+                sender_type=SenderType.BOT,
+                sender_name=sender_name,
+                message_type=MessageType.TEXT,
+                text=msg.get("text", ""),
+                reply_to_id=msg.get("parent_id", ""),
+                timestamp=int(msg.get("create_time", "0") or "0"),
+                platform="feishu",
+            )
+            self._queue.put_nowait({"event_type": "message", "message": polled_msg})
+
     # ── 内部：辅助 ──
 
     def _record_msg_chat(self, message_id: str, chat_id: str) -> None:
         """记录 message_id → chat_id 映射。"""
         self._msg_chat_map[message_id] = chat_id
-        # 限制大小
+        self._msg_chat_map.move_to_end(message_id)
+        # 限制大小：淘汰最久未使用的
         while len(self._msg_chat_map) > self._msg_chat_map_max:
-            oldest = next(iter(self._msg_chat_map))
-            del self._msg_chat_map[oldest]
+            self._msg_chat_map.popitem(last=False)
 
-    def _get_poll_targets(self) -> list[str]:
-        """返回需要轮询的群聊 ID 列表。"""
-        now = time.time()
+    def _get_poll_targets(self, now: float) -> list[str]:
+        """返回需要轮询的群聊 ID 列表。``now`` 为 time.monotonic()，不受系统时钟调整影响。"""
         # 清理过期活跃群（10 分钟无消息且非已知群）
         expired = [
             cid for cid, ts in self._active_groups.items()
@@ -699,29 +769,62 @@ class FeishuAdapter(PlatformAdapter):
                 self._active_groups[cid] = now
         return list(self._active_groups)
 
-    def _load_known_groups(self) -> None:
-        """从 groups.json 加载已知群聊 ID。"""
+    def _read_known_groups(self) -> set[str]:
+        """从 groups.json 读取已知群聊 ID（在线程中执行）。"""
         path = self._home / "groups.json"
         if not path.exists():
-            return
+            return set()
         try:
             data = json.loads(path.read_text(encoding="utf-8"))
-            self._known_group_ids = set(data.get("known_group_ids", []))
-            logger.info("加载 %d 个已知群聊", len(self._known_group_ids))
+            ids = set(data.get("known_group_ids", []))
+            logger.info("加载 %d 个已知群聊", len(ids))
+            return ids
         except Exception:
             logger.warning("加载 groups.json 失败", exc_info=True)
+            return set()
 
-    def _save_known_groups(self) -> None:
-        """保存已知群聊 ID 到 groups.json。"""
+    def _write_known_groups(self, group_ids: list[str]) -> None:
+        """保存已知群聊 ID 到 groups.json（在线程中执行，传入的是快照）。"""
         path = self._home / "groups.json"
         try:
             path.write_text(
-                json.dumps({"known_group_ids": sorted(self._known_group_ids)}, ensure_ascii=False, indent=2),
+                json.dumps({"known_group_ids": group_ids}, ensure_ascii=False, indent=2),
                 encoding="utf-8",
             )
         except Exception:
             logger.warning("保存 groups.json 失败", exc_info=True)
 
+    def _schedule_save_known_groups(self) -> None:
+        """防抖保存：已有待写入任务时直接合并，到期后在线程中写一次。"""
+        self._groups_dirty = True
+        if self._save_task is not None:
+            return
+        try:
+            self._save_task = asyncio.get_running_loop().create_task(
+                self._flush_known_groups_later(), name="feishu-groups-save",
+            )
+        except RuntimeError:
+            # 没有运行中的事件循环：直接同步写入
+            self._write_known_groups(sorted(self._known_group_ids))
+
+    async def _flush_known_groups_later(self) -> None:
+        try:
+            await asyncio.sleep(_KNOWN_GROUPS_SAVE_DELAY)
+            self._groups_dirty = False
+            write = asyncio.ensure_future(
+                asyncio.to_thread(self._write_known_groups, sorted(self._known_group_ids)),
+            )
+            try:
+                await asyncio.shield(write)
+            except asyncio.CancelledError:
+                # 线程里的写入无法中断：等它落盘再退出，免得与 disconnect 的最终写入交错
+                await write
+                raise
+        finally:
+            self._save_task = None
+        if self._groups_dirty:  # 写入期间又有变更
+            self._schedule_save_known_groups()
+
     # ── 供 gateway/calendar 使用的内部访问器 ──
 
     @property
@@ -737,11 +840,11 @@ class FeishuAdapter(PlatformAdapter):
     def register_known_group(self, chat_id: str) -> None:
         """外部注册已知群聊（如从持久化数据恢复）。"""
         self._known_group_ids.add(chat_id)
-        self._active_groups.setdefault(chat_id, time.time())
+        self._active_groups.setdefault(chat_id, time.monotonic())
 
     def remove_known_group(self, chat_id: str) -> None:
         """移除无效群聊。"""
         self._known_group_ids.discard(chat_id)
         self._active_groups.pop(chat_id, None)
         self._polled_msg_ids.pop(chat_id, None)
-        self._save_known_groups()
+        self._schedule_save_known_groups()
@@ -31,6 +31,46 @@ def _infer_receive_id_type(receive_id: str) -> str:
     return "chat_id"
 
 
+_MISSING = object()
+
+
+class _NameCache(dict):
+    """open_id → 名字缓存；内容真正变化时递增 ``version``，供出站 @提及匹配器判断是否需要重建。
+
+    入站消息会反复写入同一个名字，值不变的写入不算变化。
+    """
+
+    version = 0
+
+    def __setitem__(self, key: str, value: str) -> None:
+        if dict.get(self, key, _MISSING) != value:
+            super().__setitem__(key, value)
+            self.version += 1
+
+    def __delitem__(self, key: str) -> None:
+        super().__delitem__(key)
+        self.version += 1
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def pop(self, key: str, *default: Any) -> Any:
+        if key in self:
+            self.version += 1
+        return super().pop(key, *default)
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        if key not in self:
+            self.version += 1
+        return super().setdefault(key, default)
+
+    def clear(self) -> None:
+        if self:
+            self.version += 1
+        super().clear()
+
+
 def _build_markdown_card(text: str) -> dict:
     """将包含复杂 Markdown 的文本构建为飞书卡片（卡片支持 Markdown 渲染）。"""
     return {
@@ -83,7 +123,7 @@ class FeishuSender:
         self._app_secret = app_secret
         self._tenant_access_token: str | None = None
         self._token_expires_at: float = 0.0  # Unix timestamp
-        self._user_name_cache: dict[str, str] = {}  # open_id → 名字
+        self._user_name_cache: _NameCache = _NameCache()  # open_id → 名字
         self._cached_chats: set[str] = set()  # 已拉取成员的 chat_id
         self._left_chats: set[str] = set()    # bot 已退出的 chat_id
         self._bot_members: dict[str, set[str]] = {}  # chat_id → bot open_id 集合
@@ -570,6 +570,8 @@ class AssistantGateway:
 
         # 关闭时保存会话并断开适配器
         session_mgr.save()
+        if router.cc_session:
+            await router.cc_session.aclose()
         await adapter.disconnect()
         logger.info("会话已保存，适配器已断开，关闭完成")
 
@@ -808,8 +810,10 @@ class AssistantGateway:
                 evolution_md = self._evolution.read_evolution()
                 remaining_today = self._evolution.remaining_today
                 if self._evolution.source_root:
-                    source_summary = self._evolution.get_source_summary()
-                    git_log = self._evolution.get_recent_git_log()
+                    source_summary, git_log = await asyncio.gather(
+                        self._evolution.get_source_summary_async(),
+                        self._evolution.get_recent_git_log_async(),
+                    )
                     source_root = str(self._evolution.source_root)
 
                     # 收集错误日志分析
@@ -952,6 +956,7 @@ class AssistantGateway:
                     if new_evolution != old_evolution:
                         did_evolve = True
                         self._evolution.record_attempt()
+                        self._evolution.invalidate_source_summary()
                         logger.info("检测到进化行为，已计数")
 
                 # 进化守护：如果没有执行进化，清除 checkpoint
@@ -1008,10 +1013,12 @@ class AssistantGateway:
             else:
                 heartbeat.notify_idle()
 
-        # EVOLUTION.md 压缩：条目过多时自动摘要归档
+        # EVOLUTION.md 压缩：条目过多时自动摘要；文件过大时旧条目轮转到归档文件
         try:
             if self._evolution and self._evolution.needs_compaction():
                 await self._compact_evolution_log(router)
+            if self._evolution:
+                self._evolution.rotate_evolution()
         except Exception:
             logger.exception("EVOLUTION.md 压缩失败")
 
@@ -1291,6 +1298,10 @@ class AssistantGateway:
         if pid_path.exists():
             pid_path.unlink()
             logger.info("PID 文件已清理")
+        # 落盘进化计数等未保存的状态
+        evolution = getattr(self, "_evolution", None)
+        if evolution:
+            evolution.flush_state()
         # 标记正常关闭，供下次启动时判断是否需要回滚进化
         try:
             self._clean_shutdown_path.write_text(
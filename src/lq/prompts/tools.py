@@ -230,7 +230,7 @@ TOOL_DESC_DETECT_DRIFT = (
 TOOL_FIELD_DRIFT_DAYS = "检查最近 N 天的回复（1-7），默认 1"
 
 TOOL_FIELD_STATS_CATEGORY = (
-    "要查看的统计类别：today（今日统计）、month（本月统计）、capability（工具使用统计）"
+    "要查看的统计类别：today（今日统计）、month（本月统计）、capability（工具使用统计与 Claude Code 累计执行统计）"
 )
 
 TOOL_DESC_LIST_CHAT_MEMBERS = "查询当前群聊的成员列表（包含每人的 user_id 和显示名）。当你需要知道群里有谁、或需要获取某人的 user_id 时使用。"
@@ -83,6 +83,8 @@ class RuntimeToolsMixin:
                 for name, s in self._tool_stats.items()
                 if s["success"] + s["fail"] > 0
             }
+            if self.cc_session:
+                result["claude_code"] = self.cc_session.experience.get_stats()
         else:
             result["message"] = "统计模块未加载或类别无效"
         return result
@@ -104,11 +106,11 @@ class RuntimeToolsMixin:
 
     # ── 漂移检测 ──
 
-    def _tool_detect_drift(self, days: int = 1) -> dict:
+    async def _tool_detect_drift(self, days: int = 1) -> dict:
         """扫描最近 N 天的回复，检测行为漂移。"""
-        from lq.drift import scan_session_replies
+        from lq.drift import scan_session_replies_async
 
-        result = scan_session_replies(
+        result = await scan_session_replies_async(
             self.memory.workspace / "sessions",
             days=days,
         )
@@ -282,7 +282,7 @@ class ToolExecMixin:
                 )
 
             elif name == "detect_drift":
-                return self._tool_detect_drift(
+                return await self._tool_detect_drift(
                     input_data.get("days", 1),
                 )
 
@@ -0,0 +1,31 @@
+"""BashExecutor 直接执行快速路径单元测试"""
+
+from __future__ import annotations
+
+import pytest
+
+from lq.executor.claude_code import _simple_argv
+
+
+class TestSimpleArgv:
+    @pytest.mark.parametrize("command", [
+        "echo hello",
+        "printf hi",
+        "kill -l",
+        "test -f x",
+        "[ -f x ]",
+        "pwd",
+        "true",
+        "cd /tmp",
+    ])
+    def test_shell_builtins_use_shell(self, command):
+        """shell 内建命令不走直接执行，保持 sh -c 下的语义"""
+        assert _simple_argv(command) is None
+
+    @pytest.mark.parametrize("command", ["ls -la", "ls 'a b'"])
+    def test_simple_program_is_exec(self, command):
+        assert _simple_argv(command)[0] == "ls"
+
+    def test_shell_syntax_uses_shell(self):
+        assert _simple_argv("ls | wc -l") is None
+
@@ -0,0 +1,48 @@
+"""CCExperienceStore 倒排索引单元测试"""
+
+from __future__ import annotations
+
+import threading
+
+from lq.executor import cc_experience
+from lq.executor.cc_experience import CCExperienceEntry, CCExperienceStore
+
+
+def _entry(prompt: str) -> CCExperienceEntry:
+    return CCExperienceEntry(session_id="s", prompt=prompt, success=True)
+
+
+class TestExperienceIndex:
+    def test_record_updates_loaded_index(self, tmp_path):
+        store = CCExperienceStore(tmp_path)
+        store.record(_entry("fix parser bug"))
+        assert [e.prompt for e in store.query_similar("parser")] == ["fix parser bug"]
+        store.record(_entry("parser refactor"))
+        assert {e.prompt for e in store.query_similar("parser")} == {"fix parser bug", "parser refactor"}
+
+    def test_index_is_capped(self, tmp_path, monkeypatch):
+        """posting 数超过上限时重建，只保留最新的记录"""
+        monkeypatch.setattr(cc_experience, "_INDEX_MAX_POSTINGS", 8)
+        store = CCExperienceStore(tmp_path)
+        store.query_similar("warmup")
+        for i in range(10):
+            store.record(_entry(f"alpha{i} common"))
+        index = store._load_index()
+        assert store._index_postings <= 8
+        assert sum(len(v) for v in index.values()) == store._index_postings
+        assert store.query_similar("alpha9", limit=1)[0].prompt == "alpha9 common"
+
+    def test_record_waits_for_index_build(self, tmp_path):
+        """record() 在后台构建持有锁期间不写 .idx"""
+        store = CCExperienceStore(tmp_path)
+        store.record(_entry("first task"))
+        store._index_lock.acquire()
+        t = threading.Thread(target=store.record, args=(_entry("second task"),))
+        t.start()
+        t.join(0.2)
+        assert t.is_alive()
+        idx = store._today_path().with_suffix(".idx")
+        assert len(idx.read_bytes().splitlines()) == 1
+        store._index_lock.release()
+        t.join(1)
+        assert len(idx.read_bytes().splitlines()) == 2
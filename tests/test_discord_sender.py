@@ -0,0 +1,95 @@
+"""DiscordSender 发送队列单元测试"""
+
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import pytest
+
+from lq.discord_.sender import DiscordSender, _route_key
+
+
+class TestSendQueueShutdown:
+    async def test_aclose_mid_post_resolves_callers(self, monkeypatch):
+        """worker 正在 POST 时 aclose()：已出队的调用方不能永远挂起"""
+        sender = DiscordSender("token")
+        posting = asyncio.Event()
+
+        async def slow_post(*args, **kwargs):
+            posting.set()
+            await asyncio.sleep(3600)
+
+        monkeypatch.setattr(sender, "_post_message", slow_post)
+        first = asyncio.create_task(sender.send_message("c1", "a"))
+        second = asyncio.create_task(sender.send_message("c1", "b"))
+        await asyncio.wait_for(posting.wait(), 1)
+
+        await sender.aclose()
+
+        for task in (first, second):
+            with pytest.raises(asyncio.CancelledError):
+                await asyncio.wait_for(task, 1)
+
+    async def test_aclose_fails_queued_behind_inflight(self, monkeypatch):
+        """正在 POST 的批次之后仍在排队的请求同样被结束"""
+        sender = DiscordSender("token")
+        posting = asyncio.Event()
+
+        async def slow_post(*args, **kwargs):
+            posting.set()
+            await asyncio.sleep(3600)
+
+        monkeypatch.setattr(sender, "_post_message", slow_post)
+        first = asyncio.create_task(sender.send_message("c1", "a", reply_to="m1"))
+        await asyncio.wait_for(posting.wait(), 1)
+        queued = asyncio.create_task(sender.send_message("c1", "b"))
+        await asyncio.sleep(0)
+
+        await sender.aclose()
+
+        for task in (first, queued):
+            with pytest.raises(asyncio.CancelledError):
+                await asyncio.wait_for(task, 1)
+
+
+class TestRateLimitBuckets:
+    @staticmethod
+    def _headers(bucket: str, remaining: int, reset_after: float) -> httpx.Headers:
+        return httpx.Headers({
+            "X-RateLimit-Bucket": bucket,
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset-After": str(reset_after),
+        })
+
+    async def test_bucket_is_per_major_parameter(self, monkeypatch):
+        """同一 bucket hash 下，一个频道额度耗尽不影响另一个频道"""
+        sender = DiscordSender("token")
+        r1 = _route_key("POST", "/channels/111111/messages")
+        r2 = _route_key("POST", "/channels/222222/messages")
+        sender._update_bucket(r1, self._headers("abc", 0, 60))
+        sender._update_bucket(r2, self._headers("abc", 5, 60))
+
+        slept: list[float] = []
+
+        async def fake_sleep(delay):
+            slept.append(delay)
+
+        monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+        await sender._wait_for_bucket(r2)
+        assert slept == []
+        await sender._wait_for_bucket(r1)
+        assert len(slept) == 1 and slept[0] > 0
+
+    async def test_exhausted_bucket_sleeps_outside_lock(self):
+        """等待额度重置期间不持有 bucket 锁"""
+        sender = DiscordSender("token")
+        route = _route_key("POST", "/channels/111111/messages")
+        sender._update_bucket(route, self._headers("abc", 0, 0.2))
+
+        waiter = asyncio.create_task(sender._wait_for_bucket(route))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        (lock,) = sender._bucket_locks.values()
+        assert not lock.locked()
+        await asyncio.wait_for(waiter, 1)
@@ -0,0 +1,28 @@
+"""行为漂移检测单元测试"""
+
+from __future__ import annotations
+
+from lq.drift import check_drift
+
+
+class TestCheckDriftSnippet:
+    def test_snippet_is_longest_match_of_rule(self):
+        """同一规则多次命中时，snippet 取最长的一次而非最左的一次"""
+        text = "我用了run_bash，后来我调用了 run_claude_code"
+        (v,) = check_drift(text)
+        assert v["rule"] == "expose_tool"
+        assert v["snippet"] == "我调用了 run_claude_code"
+
+    def test_earlier_pattern_wins_over_longer_later_pattern(self):
+        """规则内按 pattern 顺序取第一个命中的 pattern"""
+        text = "接下来用 run_claude_code 来处理，我用了run_bash"
+        (v,) = check_drift(text)
+        assert v["snippet"] == "我用了run_bash"
+
+    def test_custom_rule_longest_match(self):
+        rule = {"rule": "x", "desc": "d", "severity": "low", "patterns": [r"ab+"]}
+        (v,) = check_drift("ab abbbb abb", [rule])
+        assert v["snippet"] == "abbbb"
+
+    def test_clean_text(self):
+        assert check_drift("今天天气不错") == []
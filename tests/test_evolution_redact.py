@@ -0,0 +1,55 @@
+"""EVOLUTION.md 密钥脱敏单元测试"""
+
+from __future__ import annotations
+
+from lq.evolution import EvolutionEngine, _redact_secrets
+
+
+class TestRedactSecrets:
+    def test_redacts_keys(self):
+        key = "sk-" + "a1B2c3D4e5F6g7H8i9J0k"
+        assert _redact_secrets(f"key={key}") == "key=[REDACTED:api_key]"
+        assert _redact_secrets(f"sk-ant-{'x' * 24}") == "[REDACTED:anthropic_key]"
+        assert _redact_secrets(f"token ghp_{'A' * 36}") == "token [REDACTED:github_token]"
+
+    def test_ordinary_words_untouched(self):
+        """单词内部的 sk- / ghp_ / AKIA 不是密钥"""
+        for text in (
+            "disk-usage-monitoring-script",
+            "task-scheduler-refactor-for-heartbeat",
+            "risk-assessment-notes-updated-weekly",
+            "xghp_" + "A" * 36,
+            "XAKIA" + "B" * 16,
+        ):
+            assert _redact_secrets(text) == text
+
+
+class TestEvolutionWrites:
+    def test_rollback_keeps_existing_history(self, tmp_path):
+        """追加回滚记录只脱敏新条目，不改写已有历史"""
+        engine = EvolutionEngine(tmp_path)
+        engine.ensure_evolution_file()
+        history = "\n### 2024-01-01 — disk-usage-monitoring-script 上线\n"
+        content = engine.evolution_path.read_text(encoding="utf-8")
+        engine.evolution_path.write_text(
+            content.replace("## 失败记录", "## 失败记录" + history, 1)
+            if "## 失败记录" in content else content + "\n## 失败记录" + history,
+            encoding="utf-8",
+        )
+
+        engine._record_rollback_failure(
+            "a" * 40, "b" * 40, "2024-01-02", "fix task-scheduler-refactor-for-heartbeat",
+        )
+
+        text = engine.evolution_path.read_text(encoding="utf-8")
+        assert "disk-usage-monitoring-script" in text
+        assert "task-scheduler-refactor-for-heartbeat" in text
+        assert "REDACTED" not in text
+
+    def test_rollback_entry_redacted(self, tmp_path):
+        engine = EvolutionEngine(tmp_path)
+        key = "sk-" + "Z" * 30
+        engine._record_rollback_failure("a" * 40, "b" * 40, "2024-01-02", f"leak {key}")
+        text = engine.evolution_path.read_text(encoding="utf-8")
+        assert key not in text
+        assert "[REDACTED:api_key]" in text
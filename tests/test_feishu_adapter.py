@@ -0,0 +1,60 @@
+"""FeishuAdapter 群聊列表持久化单元测试"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+
+from lq.feishu import adapter as adapter_mod
+from lq.feishu.adapter import FeishuAdapter
+
+
+def _saved_groups(home) -> list[str]:
+    return json.loads((home / "groups.json").read_text(encoding="utf-8"))["known_group_ids"]
+
+
+class TestKnownGroupsSave:
+    async def test_disconnect_cancels_pending_save(self, tmp_path, monkeypatch):
+        """防抖保存尚未到期时 disconnect：取消并等待该任务，只做一次最终写入"""
+        monkeypatch.setattr(adapter_mod, "_KNOWN_GROUPS_SAVE_DELAY", 3600)
+        ad = FeishuAdapter("app", "secret", tmp_path)
+        ad._known_group_ids.add("oc_1")
+        ad._schedule_save_known_groups()
+        task = ad._save_task
+
+        await ad.disconnect()
+
+        assert task.done() and task.cancelled()
+        assert ad._save_task is None
+        assert _saved_groups(tmp_path) == ["oc_1"]
+
+    async def test_disconnect_waits_for_inflight_write(self, tmp_path, monkeypatch):
+        """防抖写入进行中时 disconnect：等旧快照写完，最终写入不会被它覆盖"""
+        monkeypatch.setattr(adapter_mod, "_KNOWN_GROUPS_SAVE_DELAY", 0)
+        ad = FeishuAdapter("app", "secret", tmp_path)
+        started = threading.Event()
+        release = threading.Event()
+        real_write = ad._write_known_groups
+        calls: list[list[str]] = []
+
+        def slow_write(group_ids):
+            calls.append(group_ids)
+            if len(calls) == 1:
+                started.set()
+                release.wait(2)
+            real_write(group_ids)
+
+        monkeypatch.setattr(ad, "_write_known_groups", slow_write)
+        ad._known_group_ids.add("oc_1")
+        ad._schedule_save_known_groups()
+        await asyncio.to_thread(started.wait, 2)
+        ad._known_group_ids.add("oc_2")
+
+        closing = asyncio.create_task(ad.disconnect())
+        await asyncio.sleep(0.05)
+        assert len(calls) == 1  # 最终写入在等进行中的写入
+        release.set()
+        await asyncio.wait_for(closing, 2)
+
+        assert _saved_groups(tmp_path) == ["oc_1", "oc_2"]